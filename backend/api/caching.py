@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .relations import get_relations
+
+RECIPE_CACHE_KEY = 'recipe:{host}:{id}:{revision}'
+
+
+def recipe_cache_key(request, recipe):
+    # Адрес картинки абсолютный, поэтому хост входит в ключ.
+    return RECIPE_CACHE_KEY.format(
+        host=request.build_absolute_uri('/'),
+        id=recipe.id,
+        revision=recipe.revision,
+    )
+
+
+def recipe_data(request, recipe, serializer_class):
+    """
+    Данные рецепта для ответа.
+    Общая для всех пользователей часть берётся из кеша по версии
+    рецепта, флаги пользователя подставляются из его связей.
+    """
+    key = recipe_cache_key(request, recipe)
+    data = cache.get(key)
+    if data is None:
+        data = dict(serializer_class(
+            recipe, context={'request': request}).data)
+        cache.set(key, {
+            **data,
+            'author': {**data['author'], 'is_subscribed': False},
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+        }, settings.RECIPE_CACHE_TIMEOUT)
+        return data
+    relations = get_relations(request)
+    data['author']['is_subscribed'] = relations.is_subscribed(
+        recipe.author_id)
+    data['is_favorited'] = relations.is_favorited(recipe.id)
+    data['is_in_shopping_cart'] = relations.is_in_shopping_cart(recipe.id)
+    return data
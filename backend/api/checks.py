@@ -0,0 +1,19 @@
+from django.core.checks import Error, register
+
+
+@register()
+def check_deletion_relations(app_configs, **kwargs):
+    """Все связи рецепта и пользователя учтены в api.deletion."""
+    from .deletion import uncovered_relations
+
+    return [
+        Error(
+            f'{model._meta.label}.{field} не удаляется при удалении '
+            f'рецепта или пользователя.',
+            hint='Добавьте связь в RECIPE_RELATIONS или USER_RELATIONS '
+                 'в api/deletion.py.',
+            obj=model,
+            id='api.E001',
+        )
+        for model, field in uncovered_relations()
+    ]
@@ -0,0 +1,96 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .relations import get_relations
+
+
+def relation_state(request, recipes):
+    """
+    Состояние связей пользователя с рецептами страницы.
+    Загруженные связи переиспользуются при сериализации.
+    """
+    relations = get_relations(request)
+    if relations.is_anonymous or not recipes:
+        return ()
+    recipe_ids = {recipe.id for recipe in recipes}
+    author_ids = {recipe.author_id for recipe in recipes}
+    relations.load(author_ids=author_ids, recipe_ids=recipe_ids)
+    return (
+        sorted(relations.favorited & recipe_ids),
+        sorted(relations.in_shopping_cart & recipe_ids),
+        sorted(relations.subscribed & author_ids),
+    )
+
+
+def recipes_validators(request, recipes, *extra):
+    """
+    Валидаторы (ETag, Last-Modified) для набора рецептов.
+    Вычисляются по дате изменения и версии рецептов и связям
+    пользователя, без сериализации.
+    """
+    state = (
+        [(recipe.id, recipe.updated.isoformat(), recipe.revision)
+         for recipe in recipes],
+        relation_state(request, recipes),
+        extra,
+    )
+    etag = hashlib.md5(repr(state).encode()).hexdigest()
+    last_modified = None
+    if request.user.is_anonymous and recipes:
+        # Избранное и корзина не отражаются в дате изменения рецепта,
+        # поэтому Last-Modified отдаётся только анонимам.
+        last_modified = int(
+            max(recipe.updated for recipe in recipes).timestamp())
+    return etag, last_modified
+
+
+def not_modified_response(request, etag, last_modified):
+    """Ответ 304, если клиентская копия актуальна, иначе None."""
+    return get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified
+    )
+
+
+def edit_tag(recipe):
+    """Метка правки рецепта: id и версия правки, без связей и итогов."""
+    return f'{recipe.id}.{recipe.version}'
+
+
+def recipe_validators(request, recipe):
+    """
+    Валидаторы одного рецепта. ETag начинается с метки правки,
+    по которой проверяется If-Match.
+    """
+    etag, last_modified = recipes_validators(request, [recipe])
+    return f'{edit_tag(recipe)}.{etag}', last_modified
+
+
+def if_match_passes(request, recipe):
+    """
+    Проверка If-Match по метке правки из ETag: избранное, корзина или
+    пересчёт итогов после GET меняют ETag, но не мешают правке.
+    Признак W/ не учитывается: сжатие в CompressionMiddleware
+    ослабляет ETag, не меняя данных.
+    """
+    header = request.META.get('HTTP_IF_MATCH')
+    if header is None:
+        return True
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return True
+    for etag in etags:
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        if '.'.join(etag.strip('"').split('.')[:2]) == edit_tag(recipe):
+            return True
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    """Проставляет валидаторы в ответ."""
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,119 @@
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+
+from recipes.models import (FavoriteRecipe, IngredientQuantity, MealPlanEntry,
+                            Recipe, ShoppingCart, Subscription, TagInRecipe,
+                            User, WeeklyMealPlan)
+
+from . import meal_plan, tasks
+
+RECIPE_RELATIONS = (
+    IngredientQuantity, Recipe.tags.through, TagInRecipe,
+    FavoriteRecipe, ShoppingCart, MealPlanEntry,
+)
+USER_RELATIONS = (
+    (FavoriteRecipe, 'user'),
+    (ShoppingCart, 'user'),
+    (Subscription, 'user'),
+    (Subscription, 'author'),
+    (MealPlanEntry, 'user'),
+    (WeeklyMealPlan, 'user'),
+)
+
+
+def uncovered_relations():
+    """
+    Внешние ключи на рецепт и пользователя, которые не удаляются
+    delete_recipes и delete_user. _raw_delete обходит каскады Django,
+    поэтому каждая новая связь должна попасть в RECIPE_RELATIONS
+    или USER_RELATIONS. Связи пользователя из других приложений
+    (токен, группы, журнал админки) удаляет user.delete().
+    """
+    covered = {(model, 'recipe') for model in RECIPE_RELATIONS}
+    covered.update(USER_RELATIONS)
+    covered.add((Recipe, 'author'))
+    recipes_app = apps.get_app_config('recipes')
+    return [
+        (model, field.name)
+        for model in apps.get_models(include_auto_created=True)
+        for field in model._meta.fields
+        if (model, field.name) not in covered and (
+            field.related_model is Recipe
+            or (field.related_model is User
+                and model._meta.app_config is recipes_app
+                and not model._meta.auto_created)
+        )
+    ]
+
+
+def recipe_deletion_counts(recipes):
+    """
+    Число строк по моделям, которые удалит delete_recipes, — сводка
+    для страницы подтверждения вместо обхода сборщиком каскадов.
+    """
+    counts = {Recipe: recipes.count()}
+    for model in RECIPE_RELATIONS:
+        counts[model] = model.objects.filter(recipe__in=recipes).count()
+    return counts
+
+
+def user_deletion_counts(users):
+    """То же для delete_user."""
+    recipes = Recipe.objects.filter(author__in=users)
+    counts = recipe_deletion_counts(recipes)
+    relations = {}
+    for model, field in USER_RELATIONS:
+        relations[model] = relations.get(model, Q()) | Q(
+            **{f'{field}__in': users})
+    for model, condition in relations.items():
+        rows = model.objects.filter(condition)
+        if model in RECIPE_RELATIONS:
+            rows = rows.exclude(recipe__in=recipes)
+        counts[model] = counts.get(model, 0) + rows.count()
+    counts[User] = users.count()
+    return counts
+
+
+def delete_recipes(recipe_ids):
+    """
+    Удаляет рецепты и зависимые строки прямыми DELETE ... WHERE IN
+    в одной транзакции, не загружая строки в память, как это делает
+    сборщик каскадов Django. Картинки удаляются фоновой задачей,
+    итоги затронутых недель плана питания пересчитываются ею же.
+    """
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(id__in=recipe_ids)
+        images = list(recipes.exclude(image='').values_list(
+            'image', flat=True))
+        weeks = meal_plan.entry_weeks(
+            MealPlanEntry.objects.filter(recipe_id__in=recipe_ids))
+        for model in RECIPE_RELATIONS:
+            model.objects.filter(
+                recipe_id__in=recipe_ids)._raw_delete(connection.alias)
+        recipes._raw_delete(connection.alias)
+    if images:
+        tasks.delete_files.delay(names=images)
+    if weeks:
+        tasks.refresh_meal_plan_weeks.delay(weeks=[
+            [user_id, week.isoformat()] for user_id, week in weeks])
+
+
+def delete_user(user, chunk_size=1000):
+    """
+    Удаляет пользователя: рецепты пачками по chunk_size в отдельных
+    транзакциях, затем прочие связи и самого пользователя.
+    """
+    while True:
+        recipe_ids = list(Recipe.objects.filter(
+            author=user).values_list('id', flat=True)[:chunk_size])
+        if not recipe_ids:
+            break
+        delete_recipes(recipe_ids)
+    with transaction.atomic():
+        for model, field in USER_RELATIONS:
+            model.objects.filter(
+                **{field: user})._raw_delete(connection.alias)
+        # Оставшиеся связи (токен, группы) удаляет Django с сигналами.
+        user.delete()
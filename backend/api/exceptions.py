@@ -0,0 +1,16 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """If-Match не совпал с текущей версией ресурса."""
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Рецепт изменился, загрузите актуальную версию.'
+    default_code = 'precondition_failed'
+
+
+class EditConflict(APIException):
+    """Параллельная правка успела изменить ресурс раньше."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Рецепт одновременно изменён, повторите правку.'
+    default_code = 'edit_conflict'
@@ -0,0 +1,92 @@
+import contextlib
+import hashlib
+import os
+
+from django.conf import settings
+from django.db.models import (BigIntegerField, Case, F, Sum, Value,
+                              When)
+from django.db.models.functions import Cast
+
+from backend.constants import UNIT_CONVERSIONS
+from recipes.models import ShoppingCart
+
+UNIT = 'recipe__ingredient_list__ingredient__measurement_unit'
+
+
+def aggregate_ingredients(queryset):
+    """
+    Суммарное количество ингредиентов по строкам queryset
+    (корзина или план питания: поля recipe и servings)
+    с учётом числа порций и приведением единиц (кг -> г, л -> мл).
+    Считается одной агрегацией в БД в bigint.
+    """
+    factor = Case(
+        *[When(**{UNIT: unit}, then=Value(multiplier))
+          for unit, (_, multiplier) in UNIT_CONVERSIONS.items()],
+        default=Value(1),
+        output_field=BigIntegerField(),
+    )
+    base_unit = Case(
+        *[When(**{UNIT: unit}, then=Value(base))
+          for unit, (base, _) in UNIT_CONVERSIONS.items()],
+        default=F(UNIT),
+    )
+    return queryset.values(
+        name=F('recipe__ingredient_list__ingredient__name'),
+        unit=base_unit,
+    ).annotate(total=Sum(
+        Cast('recipe__ingredient_list__amount', BigIntegerField())
+        * F('servings') * factor
+    )).order_by('name', 'unit')
+
+
+def shopping_cart_ingredients(user):
+    """Суммарное количество ингредиентов из корзины пользователя."""
+    return aggregate_ingredients(ShoppingCart.objects.filter(user=user))
+
+
+def ingredients_to_lines(ingredients):
+    for ingredient in ingredients:
+        yield (
+            f"{ingredient['name']} "
+            f"({ingredient['unit']}) - "
+            f"{ingredient['total']}\n"
+        )
+
+
+def shopping_cart_lines(user):
+    """Строки списка покупок, читаемые из БД потоком."""
+    return ingredients_to_lines(shopping_cart_ingredients(user).iterator())
+
+
+def shopping_cart_version(user):
+    """Версия корзины: меняется при изменении состава или рецептов."""
+    state = list(ShoppingCart.objects.filter(user=user).order_by(
+        'recipe_id'
+    ).values_list('recipe_id', 'servings', 'recipe__updated'))
+    return hashlib.md5(repr(state).encode()).hexdigest()
+
+
+def shopping_cart_export(user):
+    """
+    Готовый файл списка покупок в EXPORTS_ROOT.
+    Файл пересобирается только при изменении корзины,
+    устаревшие версии удаляются. Возвращает имя файла.
+    """
+    directory = os.path.join(settings.EXPORTS_ROOT, 'shopping_cart')
+    os.makedirs(directory, exist_ok=True)
+    prefix = f'{user.id}-'
+    name = f'{prefix}{shopping_cart_version(user)}.txt'
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.writelines(shopping_cart_lines(user))
+        os.replace(tmp_path, path)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if (entry.name.startswith(prefix) and entry.name != name
+                        and not entry.name.endswith('.tmp')):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(entry.path)
+    return f'shopping_cart/{name}'
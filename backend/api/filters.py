@@ -1,6 +1,10 @@
+from django.db.models import Case, IntegerField, Q, When
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Recipe, Ingredient, Tag
+from recipes.search import search_variants
+
+TRIGRAM_LENGTH = 3
 
 
 class RecipeFilter(FilterSet):
@@ -13,6 +17,9 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    # Рецепты с неизвестной калорийностью (NULL) в выборку не попадают.
+    max_calories = filters.NumberFilter(
+        field_name='calories', lookup_expr='lte')
 
     class Meta:
         model = Recipe
@@ -32,9 +39,28 @@ class RecipeFilter(FilterSet):
 
 
 class IngredientFilter(FilterSet):
-    """Поиск по названию ингредиента."""
-    name = filters.CharFilter(lookup_expr='startswith')
+    """
+    Поиск по названию ингредиента без учёта регистра и раскладки.
+    Сначала совпадения с начала названия, затем внутри него.
+    Поиск по вхождению идёт по триграммному индексу, которому нужно
+    хотя бы три символа; более короткий запрос ищется только по началу
+    названия через индекс varchar_pattern_ops.
+    """
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', )
+
+    def filter_name(self, queryset, name, value):
+        prefix = Q()
+        contains = Q()
+        for variant in search_variants(value):
+            prefix |= Q(search_name__startswith=variant)
+            contains |= Q(search_name__contains=variant)
+        if len(value.strip()) < TRIGRAM_LENGTH:
+            return queryset.filter(prefix).order_by('name')
+        return queryset.filter(contains).annotate(
+            rank=Case(When(prefix, then=0), default=1,
+                      output_field=IntegerField())
+        ).order_by('rank', 'name')
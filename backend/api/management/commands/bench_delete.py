@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.deletion import delete_user
+from recipes.models import Ingredient, Tag, User
+
+from .seed_load import Command as SeedCommand
+
+
+class Command(SeedCommand):
+    help = (
+        'Сравнение каскадного удаления Django и пакетного удаления '
+        'пользователя с большим числом рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError('Сначала загрузите ингредиенты: loadcsv')
+
+        for name, delete in (
+            ('Django ORM', lambda user: user.delete()),
+            ('delete_user', delete_user),
+        ):
+            user_ids = self.create_users(1)
+            self.create_recipes(
+                options['recipes'], user_ids, [1], ingredient_ids,
+                tag_ids, options['ingredients_per_recipe'])
+            user = User.objects.get(id=user_ids[0])
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                delete(user)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{name:<12} {elapsed:8.2f} с {len(queries):8d} запросов')
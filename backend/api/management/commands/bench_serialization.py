@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.renderers import FastJSONRenderer
+from api.serializers import FlatRecipeSerializer, RecipeSerializer
+from recipes.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = 'Сравнение стоимости сериализации и рендеринга рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--user', help='email пользователя для флагов is_*')
+
+    def handle(self, *args, **options):
+        recipes = list(Recipe.objects.all()[:options['limit']])
+        if not recipes:
+            self.stderr.write('Нет рецептов, сначала заполните базу.')
+            return
+        user = None
+        if options['user']:
+            user = User.objects.get(email=options['user'])
+
+        def context():
+            # Связи пользователя кешируются на запросе, поэтому каждый
+            # замер получает новый запрос и загружает их заново.
+            request = Request(RequestFactory().get('/api/recipes/'))
+            if user is not None:
+                request.user = user
+            return {'request': request}
+
+        results = {}
+        for serializer_class in (RecipeSerializer, FlatRecipeSerializer):
+            results[serializer_class.__name__] = self.measure(
+                lambda: serializer_class(
+                    recipes, many=True, context=context()).data,
+                len(recipes), options['repeat']
+            )
+        data = RecipeSerializer(recipes, many=True, context=context()).data
+        for renderer_class in (JSONRenderer, FastJSONRenderer):
+            renderer = renderer_class()
+            results[renderer_class.__name__] = self.measure(
+                lambda: renderer.render(data), len(recipes),
+                options['repeat']
+            )
+
+        for name, (per_recipe, queries) in results.items():
+            self.stdout.write(
+                f'{name:<24} {per_recipe * 1e6:10.1f} мкс/рецепт '
+                f'{queries:6d} запросов'
+            )
+
+    @staticmethod
+    def measure(func, count, repeat):
+        """Лучшее время на один рецепт и число запросов к БД."""
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / count, len(queries)
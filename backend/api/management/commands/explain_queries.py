@@ -0,0 +1,86 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from api.exports import shopping_cart_ingredients
+from api.filters import IngredientFilter
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientQuantity,
+                            Recipe, ShoppingCart, Subscription, Tag, User)
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE типовых запросов эндпоинтов '
+        'на заполненной базе с отчётом о последовательных сканированиях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ignore', nargs='*', default=['recipes_tag'],
+            help='маленькие таблицы, для которых Seq Scan допустим')
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='печатать планы целиком')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда работает только с PostgreSQL')
+        problems = 0
+        for name, queryset in self.queries():
+            plan = queryset.explain(analyze=True)
+            tables = set(SEQ_SCAN.findall(plan)) - set(options['ignore'])
+            if tables:
+                problems += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: Seq Scan on {", ".join(sorted(tables))}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['verbose_plans'] or tables:
+                self.stdout.write(plan + '\n')
+        if problems:
+            raise CommandError(
+                f'Последовательные сканирования в {problems} запросах')
+
+    def queries(self):
+        """Запросы, которые выполняют эндпоинты API."""
+        user = User.objects.annotate(
+            favorites=Count('favoriterecipe_related_user')
+        ).order_by('-favorites').first()
+        author = User.objects.annotate(
+            recipes_count=Count('recipe')
+        ).order_by('-recipes_count').first()
+        tag = Tag.objects.first()
+        if user is None or tag is None:
+            raise CommandError('База пуста: запустите loadcsv и seed_load')
+        recipes = Recipe.objects.order_by('-created')
+        page_ids = list(recipes.values_list('id', flat=True)[:6])
+
+        yield 'recipes feed', recipes[:6]
+        yield 'recipes by author', recipes.filter(author=author)[:6]
+        yield 'recipes by tag', recipes.filter(tags__slug=tag.slug)[:6]
+        yield 'recipes favorited', recipes.filter(
+            favoriterecipe_related_recipe__user=user)[:6]
+        yield 'recipes in cart', recipes.filter(
+            shoppingcart_related_recipe__user=user)[:6]
+        yield 'page ingredients', IngredientQuantity.objects.filter(
+            recipe_id__in=page_ids
+        ).values('recipe_id', 'ingredient__name', 'amount')
+        yield 'page tags', Recipe.tags.through.objects.filter(
+            recipe_id__in=page_ids).values('recipe_id', 'tag__slug')
+        yield 'is_favorited', FavoriteRecipe.objects.filter(
+            user=user, recipe__in=page_ids).values('recipe_id')
+        yield 'is_in_shopping_cart', ShoppingCart.objects.filter(
+            user=user, recipe__in=page_ids).values('recipe_id')
+        yield 'is_subscribed', Subscription.objects.filter(
+            user=user, author__in=[author.id]).values('author_id')
+        yield 'subscriptions', Subscription.objects.filter(
+            user=user).values('author_id')
+        yield 'ingredient search', IngredientFilter().filter_name(
+            Ingredient.objects.all(), 'name', 'мол')
+        yield 'admin recipe search', Recipe.objects.filter(
+            name__istartswith='суп')
+        yield 'shopping cart', shopping_cart_ingredients(user)
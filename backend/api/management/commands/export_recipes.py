@@ -0,0 +1,92 @@
+import gzip
+import json
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import IngredientQuantity, Recipe, User
+
+
+def open_archive(path, mode):
+    """NDJSON-архив, при расширении .gz — сжатый gzip."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов с ингредиентами и тегами в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл архива (.ndjson или .gz)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = 0
+        with open_archive(options['path'], 'w') as archive:
+            for chunk in self.chunks(options['chunk_size']):
+                for recipe in chunk:
+                    archive.write(
+                        json.dumps(recipe, ensure_ascii=False) + '\n')
+                count += len(chunk)
+        self.stdout.write(f'Выгружено рецептов: {count}')
+
+    def chunks(self, chunk_size):
+        """
+        Рецепты пачками по первичному ключу: память ограничена
+        размером пачки, связи читаются одним запросом на пачку.
+        """
+        last_id = 0
+        while True:
+            recipes = list(Recipe.objects.filter(
+                id__gt=last_id
+            ).order_by('id').values(
+                'id', 'author_id', 'name', 'image', 'text', 'cooking_time',
+                'created'
+            )[:chunk_size])
+            if not recipes:
+                return
+            last_id = recipes[-1]['id']
+            recipe_ids = [recipe['id'] for recipe in recipes]
+
+            authors = {
+                author.pop('id'): author
+                for author in User.objects.filter(
+                    id__in={recipe['author_id'] for recipe in recipes}
+                ).values('id', 'email', 'username', 'first_name', 'last_name')
+            }
+            tags = {}
+            for row in Recipe.tags.through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values('recipe_id', 'tag__name', 'tag__color', 'tag__slug'):
+                tags.setdefault(row['recipe_id'], []).append({
+                    'name': row['tag__name'],
+                    'color': row['tag__color'],
+                    'slug': row['tag__slug'],
+                })
+            ingredients = {}
+            for row in IngredientQuantity.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'
+            ):
+                ingredients.setdefault(row['recipe_id'], []).append({
+                    'name': row['ingredient__name'],
+                    'measurement_unit': row['ingredient__measurement_unit'],
+                    'amount': row['amount'],
+                })
+
+            yield [
+                {
+                    'id': recipe['id'],
+                    'author': authors[recipe['author_id']],
+                    'name': recipe['name'],
+                    'image': recipe['image'],
+                    'text': recipe['text'],
+                    'cooking_time': recipe['cooking_time'],
+                    'created': recipe['created'].isoformat(),
+                    'tags': tags.get(recipe['id'], []),
+                    'ingredients': ingredients.get(recipe['id'], []),
+                }
+                for recipe in recipes
+            ]
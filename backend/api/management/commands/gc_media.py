@@ -0,0 +1,91 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Поиск и удаление файлов в MEDIA_ROOT, на которые не ссылается '
+        'ни один рецепт. Файлы обходятся потоком и сверяются с базой '
+        'пачками, поэтому память не зависит от их числа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix', default=Recipe._meta.get_field('image').upload_to,
+            help='каталог внутри MEDIA_ROOT, по умолчанию upload_to картинок')
+        parser.add_argument(
+            '--grace', type=int, default=24 * 60 * 60,
+            help='не трогать файлы моложе стольких секунд')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только отчёт, без удаления')
+
+    def handle(self, *args, **options):
+        root = os.path.join(settings.MEDIA_ROOT, options['prefix'])
+        deadline = time.time() - options['grace']
+        files = total_size = orphans = orphan_size = 0
+        entries = self.scan(root)
+        while True:
+            batch = {
+                self.media_name(entry.path): entry
+                for entry in islice(entries, options['batch_size'])
+            }
+            if not batch:
+                break
+            referenced = set(Recipe.objects.filter(
+                image__in=batch).values_list('image', flat=True))
+            for name, entry in batch.items():
+                try:
+                    # Свежий stat после запроса ссылок: повторная загрузка
+                    # той же картинки обновляет mtime файла.
+                    stat = os.stat(entry.path)
+                except FileNotFoundError:
+                    continue
+                files += 1
+                total_size += stat.st_size
+                if name in referenced or stat.st_mtime > deadline:
+                    continue
+                orphans += 1
+                orphan_size += stat.st_size
+                if not options['dry_run']:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        action = 'можно освободить' if options['dry_run'] else 'удалено'
+        self.stdout.write(
+            f'Файлов: {files} ({self.size(total_size)}). '
+            f'Без ссылок: {orphans}, {action} {self.size(orphan_size)}.'
+        )
+
+    def scan(self, path):
+        """Рекурсивный обход каталога без построения списка файлов."""
+        try:
+            iterator = os.scandir(path)
+        except FileNotFoundError:
+            return
+        with iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self.scan(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    @staticmethod
+    def media_name(path):
+        """Имя файла в том виде, в каком оно хранится в поле модели."""
+        return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+    @staticmethod
+    def size(value):
+        for unit in ('Б', 'КБ', 'МБ', 'ГБ'):
+            if value < 1024 or unit == 'ГБ':
+                return f'{value:.1f} {unit}'
+            value /= 1024
@@ -0,0 +1,184 @@
+import json
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import Ingredient, IngredientQuantity, Recipe, Tag, User
+from recipes.nutrition import refresh_recipes
+from recipes.search import normalize_name
+
+from .export_recipes import open_archive
+
+
+class Command(BaseCommand):
+    help = 'Загрузка рецептов из NDJSON-архива export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл архива (.ndjson или .gz)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.tag_conflicts = set()
+        count = 0
+        with open_archive(options['path'], 'r') as archive:
+            lines = (line for line in archive if line.strip())
+            while True:
+                chunk = [
+                    json.loads(line)
+                    for line in islice(lines, options['chunk_size'])
+                ]
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                count += len(chunk)
+                self.stdout.write(f'Загружено рецептов: {count}')
+
+    def import_chunk(self, chunk):
+        """Пачка рецептов: несколько bulk_create с переназначением FK."""
+        authors = self.remap_authors(chunk)
+        self.remap_ingredients(chunk)
+        self.remap_tags(chunk)
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author_id=authors[item['author']['email']],
+                name=item['name'],
+                image=item['image'],
+                text=item['text'],
+                cooking_time=item['cooking_time'],
+            )
+            for item in chunk
+        ])
+        IngredientQuantity.objects.bulk_create([
+            IngredientQuantity(
+                recipe_id=recipe.id,
+                ingredient_id=self.ingredients[
+                    (ingredient['name'], ingredient['measurement_unit'])],
+                amount=ingredient['amount'],
+            )
+            for recipe, item in zip(recipes, chunk)
+            for ingredient in item['ingredients']
+        ])
+        # auto_now_add перезаписывает created при вставке, поэтому
+        # дата публикации из архива восстанавливается отдельно.
+        dated = []
+        for recipe, item in zip(recipes, chunk):
+            if item.get('created'):
+                recipe.created = parse_datetime(item['created'])
+                dated.append(recipe)
+        Recipe.objects.bulk_update(dated, ('created',))
+        TagThrough = Recipe.tags.through
+        TagThrough.objects.bulk_create([
+            TagThrough(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, tag_id in {
+                (recipe.id, self.tags[tag['slug']])
+                for recipe, item in zip(recipes, chunk)
+                for tag in item['tags'] if tag['slug'] in self.tags
+            }
+        ])
+        refresh_recipes([recipe.id for recipe in recipes])
+
+    def remap_authors(self, chunk):
+        """
+        email -> id; недостающие пользователи создаются без пароля.
+        Занятый другим пользователем username получает суффикс.
+        """
+        authors = {item['author']['email']: item['author'] for item in chunk}
+        existing = dict(User.objects.filter(
+            email__in=authors
+        ).values_list('email', 'id'))
+        missing = [
+            User(**author, password=make_password(None))
+            for email, author in authors.items() if email not in existing
+        ]
+        taken = set(User.objects.filter(
+            username__in=[user.username for user in missing]
+        ).values_list('username', flat=True))
+        for user in missing:
+            if user.username in taken:
+                base = user.username[:140]
+                taken |= set(User.objects.filter(
+                    username__startswith=base
+                ).values_list('username', flat=True))
+                number = 2
+                while f'{base}_{number}' in taken:
+                    number += 1
+                user.username = f'{base}_{number}'
+            taken.add(user.username)
+        if missing:
+            User.objects.bulk_create(missing)
+            existing.update(User.objects.filter(
+                email__in=[user.email for user in missing]
+            ).values_list('email', 'id'))
+        return existing
+
+    def remap_ingredients(self, chunk):
+        missing = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for item in chunk for ingredient in item['ingredients']
+        } - self.ingredients.keys()
+        if missing:
+            Ingredient.objects.bulk_create([
+                Ingredient(name=name, measurement_unit=unit,
+                           search_name=normalize_name(name))
+                for name, unit in missing
+            ])
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in missing}
+            ).values_list('id', 'name', 'measurement_unit'):
+                self.ingredients[(name, unit)] = pk
+
+    def remap_tags(self, chunk):
+        """
+        slug -> id. Тег, не найденный по slug, ищется по названию;
+        новый создаётся, только если свободны название и цвет. Иначе
+        конфликт попадает в отчёт, а рецепты загружаются без тега.
+        """
+        missing = {
+            tag['slug']: tag for item in chunk for tag in item['tags']
+            if tag['slug'] not in self.tags
+            and tag['slug'] not in self.tag_conflicts
+        }
+        if not missing:
+            return
+        by_name = dict(Tag.objects.filter(
+            name__in={tag['name'] for tag in missing.values()}
+        ).values_list('name', 'id'))
+        colors = dict(Tag.objects.filter(
+            color__in={tag['color'] for tag in missing.values()}
+        ).values_list('color', 'name'))
+        created, aliases = [], {}
+        for slug, tag in missing.items():
+            if tag['name'] in by_name:
+                # Тег с этим названием может создаваться в этой же пачке.
+                aliases[slug] = tag['name']
+                self.stderr.write(self.style.WARNING(
+                    f'Тег «{tag["name"]}» уже есть с другим slug, '
+                    f'вместо {slug} использован существующий.'))
+            elif tag['color'] in colors:
+                self.tag_conflicts.add(slug)
+                self.stderr.write(self.style.WARNING(
+                    f'Тег «{tag["name"]}» ({slug}) не создан: цвет '
+                    f'{tag["color"]} занят тегом «{colors[tag["color"]]}», '
+                    f'рецепты загружены без него.'))
+            else:
+                created.append(Tag(**tag))
+                by_name[tag['name']] = None
+                colors[tag['color']] = tag['name']
+        if created:
+            Tag.objects.bulk_create(created)
+            for slug, pk, name in Tag.objects.filter(
+                slug__in=[tag.slug for tag in created]
+            ).values_list('slug', 'id', 'name'):
+                self.tags[slug] = by_name[name] = pk
+        for slug, name in aliases.items():
+            self.tags[slug] = by_name[name]
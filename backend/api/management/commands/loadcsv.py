@@ -1,18 +1,71 @@
 import csv
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
 from backend.settings import CSV_FILES_DIR
-from recipes.models import Ingredient, Tag
+from recipes.models import Ingredient, IngredientQuantity, Tag
+from recipes.nutrition import NUTRIENTS, refresh_recipes
+from recipes.search import normalize_name
 
 
 class Command(BaseCommand):
     help = 'Загрузка ингредиентов в базу данных'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nutrition',
+            help='CSV с заголовком name,measurement_unit,calories,proteins,'
+                 'fats,carbohydrates,price: загрузить только пищевую '
+                 'ценность и цены ингредиентов на единицу измерения')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
     def handle(self, *args, **kwargs):
+        if kwargs['nutrition']:
+            self.load_nutrition(kwargs['nutrition'], kwargs['batch_size'])
+            return
         self.load_ingredients()
         self.load_tags()
 
+    def load_nutrition(self, path, batch_size):
+        """
+        Обновляет ингредиенты пачками и пересчитывает итоги
+        рецептов, в которые они входят.
+        """
+        updated = set()
+        with open(path, encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            while True:
+                rows = {
+                    (row['name'], row['measurement_unit']): row
+                    for row in islice(reader, batch_size)
+                }
+                if not rows:
+                    break
+                ingredients = []
+                for ingredient in Ingredient.objects.filter(
+                    name__in={name for name, _ in rows}
+                ):
+                    row = rows.get(
+                        (ingredient.name, ingredient.measurement_unit))
+                    if row is None:
+                        continue
+                    for field in NUTRIENTS:
+                        value = row.get(field)
+                        setattr(ingredient, field,
+                                float(value) if value else None)
+                    ingredients.append(ingredient)
+                with transaction.atomic():
+                    Ingredient.objects.bulk_update(
+                        ingredients, tuple(NUTRIENTS))
+                updated.update(ingredient.id for ingredient in ingredients)
+        recipe_ids = IngredientQuantity.objects.filter(
+            ingredient_id__in=updated
+        ).values_list('recipe_id', flat=True).distinct()
+        refresh_recipes(recipe_ids.iterator())
+        self.stdout.write(f'Обновлено ингредиентов: {len(updated)}')
+
     def load_ingredients(self):
         with open(
             f'{CSV_FILES_DIR}/ingredients.csv', encoding='utf-8'
@@ -26,6 +79,7 @@ class Command(BaseCommand):
                     ingredient = Ingredient(
                         name=row[0],
                         measurement_unit=row[1],
+                        search_name=normalize_name(row[0]),
                     )
                     ingredients.append(ingredient)
             if ingredients:
@@ -0,0 +1,83 @@
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Запускается в отдельном интерпретаторе с -X importtime: загружает
+# WSGI-приложение и выполняет первый запрос, как воркер gunicorn.
+CHILD = '''
+import json, time
+start = time.perf_counter()
+from backend.wsgi import application
+loaded = time.perf_counter()
+from django.test import RequestFactory
+statuses = []
+environ = RequestFactory().get({path!r}).environ
+body = application(environ, lambda status, headers: statuses.append(status))
+b''.join(body)
+print(json.dumps({{
+    'loaded': loaded - start,
+    'first_request': time.perf_counter() - loaded,
+    'status': statuses[0],
+}}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Профиль запуска воркера: время импорта по модулям и пакетам '
+        '(python -X importtime) и время до ответа на первый запрос'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--path', default='/api/tags/',
+                            help='адрес первого запроса')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             CHILD.format(path=options['path'])],
+            capture_output=True, text=True,
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = self.parse(result.stderr)
+
+        packages = defaultdict(int)
+        for name, own, _ in modules:
+            packages[name.split('.')[0]] += own
+        self.stdout.write('Пакеты по собственному времени импорта:')
+        for name, own in sorted(
+                packages.items(), key=lambda item: -item[1]
+        )[:options['top']]:
+            self.stdout.write(f'  {name:<32} {own / 1000:8.1f} мс')
+        self.stdout.write('Модули по накопленному времени импорта:')
+        for name, _, cumulative in sorted(
+                modules, key=lambda module: -module[2])[:options['top']]:
+            self.stdout.write(f'  {name:<48} {cumulative / 1000:8.1f} мс')
+        self.stdout.write(
+            f'Загрузка приложения: {timings["loaded"]:.2f} с, '
+            f'первый запрос ({timings["status"]}): '
+            f'{timings["first_request"]:.2f} с, '
+            f'всего с запуском интерпретатора: {elapsed:.2f} с'
+        )
+
+    @staticmethod
+    def parse(output):
+        """Строки importtime: (модуль, своё время, накопленное) в мкс."""
+        modules = []
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            if own.strip().isdigit():
+                modules.append(
+                    (name.strip(), int(own), int(cumulative)))
+        return modules
@@ -0,0 +1,176 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientQuantity,
+                            Recipe, ShoppingCart, Subscription, Tag, User)
+
+SEED_PASSWORD = 'seed-password'
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'блины',
+    'овощной', 'куриный', 'грибной', 'домашний', 'быстрый', 'летний',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических данных для нагрузочного тестирования. '
+        'Популярность авторов распределена по степенному закону.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--skew', type=float, default=1.2,
+                            help='показатель степенного закона')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredient_ids or not tag_ids:
+            raise CommandError('Сначала загрузите ингредиенты: loadcsv')
+
+        user_ids = self.create_users(options['users'])
+        weights = self.power_law(len(user_ids), options['skew'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, weights,
+            ingredient_ids, tag_ids, options['ingredients_per_recipe']
+        )
+        # Рецепты популярных авторов чаще попадают в избранное и корзину:
+        # вес рецепта равен весу его автора.
+        recipe_weights = self.author_weighted(
+            recipe_ids, user_ids, options['skew'])
+        self.create_relations(
+            Subscription, 'author_id', user_ids, user_ids, weights,
+            options['subscriptions'])
+        self.create_relations(
+            FavoriteRecipe, 'recipe_id', user_ids, recipe_ids,
+            recipe_weights, options['favorites'])
+        self.create_relations(
+            ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+            recipe_weights, options['cart'])
+        self.stdout.write(
+            f'Создано: пользователей {len(user_ids)}, '
+            f'рецептов {len(recipe_ids)}. Пароль: {SEED_PASSWORD}'
+        )
+
+    @staticmethod
+    def power_law(count, skew):
+        """
+        Накопленные веса элементов: i-й элемент выбирается
+        пропорционально 1/i**skew.
+        """
+        return list(accumulate(
+            1 / (rank ** skew) for rank in range(1, count + 1)))
+
+    def author_weighted(self, recipe_ids, user_ids, skew):
+        """Накопленные веса рецептов по популярности их авторов."""
+        author_weights = {
+            user_id: 1 / (rank ** skew)
+            for rank, user_id in enumerate(user_ids, start=1)
+        }
+        authors = {}
+        for start in range(0, len(recipe_ids), self.batch_size):
+            authors.update(Recipe.objects.filter(
+                id__in=recipe_ids[start:start + self.batch_size]
+            ).values_list('id', 'author_id'))
+        return list(accumulate(
+            author_weights[authors[recipe_id]] for recipe_id in recipe_ids))
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def create_users(self, count):
+        start = User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        password = make_password(SEED_PASSWORD)
+        with transaction.atomic():
+            self.bulk_create(User, [
+                User(
+                    email=f'seed{start + number}@example.com',
+                    username=f'seed{start + number}',
+                    first_name='Seed',
+                    last_name=str(start + number),
+                    password=password,
+                )
+                for number in range(1, count + 1)
+            ])
+        return list(User.objects.filter(
+            username__startswith='seed', id__gt=start
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, count, user_ids, weights, ingredient_ids,
+                       tag_ids, ingredients_per_recipe):
+        start = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        created = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            authors = self.random.choices(
+                user_ids, cum_weights=weights, k=size)
+            with transaction.atomic():
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        author_id=author_id,
+                        name=' '.join(self.random.sample(WORDS, 3)),
+                        text=' '.join(self.random.choices(WORDS, k=60)),
+                        cooking_time=self.random.randint(5, 180),
+                    )
+                    for author_id in authors
+                ])
+                recipe_ids = list(Recipe.objects.filter(
+                    id__gt=start
+                ).order_by('id').values_list('id', flat=True)[
+                    created:created + size])
+                self.bulk_create(IngredientQuantity, [
+                    IngredientQuantity(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 500),
+                    )
+                    for recipe_id in recipe_ids
+                    for ingredient_id in self.random.sample(
+                        ingredient_ids,
+                        min(ingredients_per_recipe, len(ingredient_ids)))
+                ])
+                TagThrough = Recipe.tags.through
+                self.bulk_create(TagThrough, [
+                    TagThrough(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in recipe_ids
+                    for tag_id in self.random.sample(
+                        tag_ids, self.random.randint(1, len(tag_ids)))
+                ])
+            created += size
+            self.stdout.write(f'Рецептов: {created}/{count}')
+        return list(Recipe.objects.filter(
+            id__gt=start).order_by('id').values_list('id', flat=True))
+
+    def create_relations(self, model, target_field, user_ids, target_ids,
+                         weights, per_user):
+        """Связи пользователей с целями, выбранными с учётом весов."""
+        if not target_ids:
+            return
+        objects = []
+        for user_id in user_ids:
+            for target_id in set(self.random.choices(
+                    target_ids, cum_weights=weights, k=per_user)):
+                if model is Subscription and target_id == user_id:
+                    continue
+                objects.append(
+                    model(user_id=user_id, **{target_field: target_id}))
+            if len(objects) >= self.batch_size:
+                self.bulk_create(model, objects)
+                objects = []
+        self.bulk_create(model, objects)
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from recipes.models import MealPlanEntry, WeeklyMealPlan
+
+from .exports import aggregate_ingredients
+
+
+def week_start(date):
+    """Понедельник недели, в которую попадает дата."""
+    return date - timedelta(days=date.weekday())
+
+
+def refresh_week(user_id, week):
+    """
+    Пересчитывает итоги недели пользователя: суммарные ингредиенты,
+    время приготовления и распределение тегов. Запросы ограничены
+    записями одной недели по индексу (user, date).
+    Строка итогов блокируется до подсчёта, поэтому параллельные
+    пересчёты одной недели идут по очереди и последний видит все
+    изменения, а одновременное первое создание не падает на unique.
+    """
+    entries = MealPlanEntry.objects.filter(
+        user_id=user_id, date__gte=week, date__lt=week + timedelta(days=7))
+    with transaction.atomic():
+        weekly, _ = WeeklyMealPlan.objects.select_for_update().get_or_create(
+            user_id=user_id, week=week)
+        totals = entries.aggregate(
+            recipes_count=Count('id'),
+            cooking_time=Sum('recipe__cooking_time'))
+        weekly.recipes_count = totals['recipes_count']
+        weekly.cooking_time = totals['cooking_time'] or 0
+        weekly.ingredients = [
+            {'name': row['name'], 'unit': row['unit'],
+             'total': row['total']}
+            for row in aggregate_ingredients(entries)
+            if row['name'] is not None
+        ]
+        weekly.tags = dict(entries.filter(
+            recipe__tags__isnull=False
+        ).values_list('recipe__tags__slug').annotate(
+            Count('id')).order_by())
+        weekly.save()
+    return weekly
+
+
+def refresh_weeks(user_id, dates):
+    for week in {week_start(date) for date in dates}:
+        refresh_week(user_id, week)
+
+
+def get_week(user_id, date):
+    """Итоги недели одним чтением; пересчитываются, если их ещё нет."""
+    week = week_start(date)
+    weekly = WeeklyMealPlan.objects.filter(user_id=user_id, week=week).first()
+    if weekly is None:
+        weekly = refresh_week(user_id, week)
+    return weekly
+
+
+def entry_weeks(entries):
+    """Пары (пользователь, понедельник) для записей плана."""
+    return {
+        (user_id, week_start(date))
+        for user_id, date in entries.values_list('user_id', 'date')
+    }
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    encodings = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor()
+    for item in sequence:
+        data = compressor.process(item)
+        data += compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов brotli или gzip в зависимости от Accept-Encoding.
+    Короткие ответы (меньше COMPRESSION_MIN_SIZE) не сжимаются,
+    потоковые ответы сжимаются по частям. Ответы с X-Accel-Redirect
+    пропускаются: файл отдаёт nginx.
+    """
+
+    def process_response(self, request, response):
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        if (response.has_header('Content-Encoding')
+                or response.has_header('X-Accel-Redirect')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings:
+            encoding = 'br'
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = brotli_sequence(
+                    response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content)
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed_content = brotli.compress(response.content)
+            else:
+                compressed_content = compress_string(response.content)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Заголовки с остатком бюджета запросов от CostThrottle."""
+
+    def process_response(self, request, response):
+        for header, value in getattr(request, 'rate_limit', {}).items():
+            response[header] = str(value)
+        return response
@@ -0,0 +1,65 @@
+from recipes.models import FavoriteRecipe, ShoppingCart, Subscription
+
+
+class UserRelations:
+    """
+    Связи текущего пользователя с авторами и рецептами.
+    Загружаются пачками только для нужных id и переиспользуются
+    всеми сериализаторами в пределах запроса.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.subscribed = set()
+        self.favorited = set()
+        self.in_shopping_cart = set()
+        self.loaded_authors = set()
+        self.loaded_recipes = set()
+
+    @property
+    def is_anonymous(self):
+        return self.user is None or self.user.is_anonymous
+
+    def load(self, author_ids=(), recipe_ids=()):
+        """Догружает связи для ещё не проверенных id."""
+        if self.is_anonymous:
+            return
+        author_ids = set(author_ids) - self.loaded_authors
+        if author_ids:
+            self.subscribed.update(Subscription.objects.filter(
+                user=self.user, author__in=author_ids
+            ).values_list('author_id', flat=True))
+            self.loaded_authors |= author_ids
+        recipe_ids = set(recipe_ids) - self.loaded_recipes
+        if recipe_ids:
+            self.favorited.update(FavoriteRecipe.objects.filter(
+                user=self.user, recipe__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            self.in_shopping_cart.update(ShoppingCart.objects.filter(
+                user=self.user, recipe__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+            self.loaded_recipes |= recipe_ids
+
+    def is_subscribed(self, author_id):
+        self.load(author_ids=(author_id,))
+        return author_id in self.subscribed
+
+    def is_favorited(self, recipe_id):
+        self.load(recipe_ids=(recipe_id,))
+        return recipe_id in self.favorited
+
+    def is_in_shopping_cart(self, recipe_id):
+        self.load(recipe_ids=(recipe_id,))
+        return recipe_id in self.in_shopping_cart
+
+
+def get_relations(request):
+    """Связи пользователя, привязанные к запросу."""
+    if request is None:
+        return UserRelations(None)
+    http_request = getattr(request, '_request', request)
+    relations = getattr(http_request, 'user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        http_request.user_relations = relations
+    return relations
@@ -0,0 +1,33 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JS_LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON рендерер на orjson.
+    Если orjson не установлен или запрошен отступ (browsable API),
+    работает как стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (orjson is None or data is None
+                or self.get_indent(accepted_media_type, renderer_context)):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=encoders.JSONEncoder().default)
+        # Как и JSONRenderer, экранируем разделители строк для JS.
+        for char, escaped in JS_LINE_SEPARATORS:
+            if char in ret:
+                ret = ret.replace(char, escaped)
+        return ret
@@ -1,13 +1,21 @@
 import base64
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
 
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from rest_framework import serializers
+from recipes.nutrition import TOTALS, set_totals
 from recipes.models import (
-    User, Tag, Ingredient, Recipe, TagInRecipe, ShoppingCart,
-    IngredientQuantity, Subscription, FavoriteRecipe
+    User, Tag, Ingredient, Recipe, ShoppingCart,
+    IngredientQuantity, Subscription, FavoriteRecipe, MealPlanEntry,
+    WeeklyMealPlan
 )
 
+from .exceptions import EditConflict
+from .relations import get_relations
+from .tasks import delete_files, schedule_meal_plan_refresh
+
 
 class Base64ImageField(serializers.ImageField):
     """Кодирование изображения в base64."""
@@ -21,6 +29,18 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class RelationsListSerializer(serializers.ListSerializer):
+    """
+    Перед сериализацией списка одним запросом загружает связи
+    пользователя для всех объектов страницы.
+    """
+
+    def to_representation(self, data):
+        iterable = list(data.all() if hasattr(data, 'all') else data)
+        self.child.load_relations(iterable)
+        return super().to_representation(iterable)
+
+
 class CustomUserSerializer(UserSerializer):
     """Сериализатор модели User"""
 
@@ -34,14 +54,16 @@ class CustomUserSerializer(UserSerializer):
             'first_name', 'last_name',
             'is_subscribed'
         )
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, users):
+        get_relations(self.context.get('request')).load(
+            author_ids=[user.id for user in users])
 
     def get_is_subscribed(self, obj):
         """Проверка подписки"""
-
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(user=user, author=obj.id).exists()
+        return get_relations(
+            self.context.get('request')).is_subscribed(obj.id)
 
 
 class CustomCreateUserSerializer(UserCreateSerializer):
@@ -61,12 +83,17 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class TagFacetSerializer(TagSerializer):
+    """Тег с числом рецептов, подходящих под текущие фильтры."""
+    recipes_count = serializers.IntegerField(read_only=True)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор ингредиентов"""
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
         read_only_fields = ('id', 'name', 'measurement_unit',)
 
 
@@ -95,28 +122,115 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time'
+                  'image', 'text', 'cooking_time', *TOTALS
                   )
+        read_only_fields = TOTALS
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, recipes):
+        get_relations(self.context.get('request')).load(
+            author_ids=[recipe.author_id for recipe in recipes],
+            recipe_ids=[recipe.id for recipe in recipes],
+        )
 
     def get_is_favorited(self, obj):
         """Проверка на добавление в избранное"""
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return FavoriteRecipe.objects.filter(
-            user=request.user,
-            recipe=obj
-        ).exists()
+        return get_relations(
+            self.context.get('request')).is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
         """Возвращает объекты в корзине"""
+        return get_relations(
+            self.context.get('request')).is_in_shopping_cart(obj.id)
+
+
+class FlatRecipeSerializer:
+    """
+    Быстрая сериализация рецептов только для чтения.
+    Отдаёт те же данные, что и RecipeSerializer, но собирает их
+    из .values() связанных таблиц фиксированным числом запросов,
+    минуя поля ModelSerializer.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        recipes = list(self.instance) if self.many else [self.instance]
+        data = self.to_representation(recipes)
+        return data if self.many else data[0]
+
+    def to_representation(self, recipes):
+        if not recipes:
+            return []
         request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(
-            user=request.user,
-            recipe=obj
-        ).exists()
+        recipe_ids = [recipe.id for recipe in recipes]
+        author_ids = {recipe.author_id for recipe in recipes}
+
+        tags = {}
+        for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            tags.setdefault(row['recipe_id'], []).append({
+                'id': row['tag_id'],
+                'name': row['tag__name'],
+                'color': row['tag__color'],
+                'slug': row['tag__slug'],
+            })
+        ingredients = {}
+        for row in IngredientQuantity.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients.setdefault(row['recipe_id'], []).append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+        authors = {
+            author['id']: author for author in User.objects.filter(
+                id__in=author_ids
+            ).values('email', 'id', 'username', 'first_name', 'last_name')
+        }
+
+        relations = get_relations(request)
+        relations.load(author_ids=author_ids, recipe_ids=recipe_ids)
+
+        image_field = Recipe._meta.get_field('image')
+        data = []
+        for recipe in recipes:
+            image = None
+            if recipe.image:
+                image = image_field.storage.url(recipe.image.name)
+                if request is not None:
+                    image = request.build_absolute_uri(image)
+            data.append({
+                'id': recipe.id,
+                'tags': tags.get(recipe.id, []),
+                'author': {
+                    **authors[recipe.author_id],
+                    'is_subscribed':
+                        recipe.author_id in relations.subscribed,
+                },
+                'ingredients': ingredients.get(recipe.id, []),
+                'is_favorited': recipe.id in relations.favorited,
+                'is_in_shopping_cart':
+                    recipe.id in relations.in_shopping_cart,
+                'name': recipe.name,
+                'image': image,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                **{field: getattr(recipe, field) for field in TOTALS},
+            })
+        return data
 
 
 class CreateIngredientsInRecipeSerializer(serializers.ModelSerializer):
@@ -157,54 +271,88 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def validate(self, data):
-        """Метод валидации ингредиентов"""
+        """
+        Метод валидации ингредиентов и тегов. При частичном
+        обновлении проверяются только переданные поля.
+        """
+
+        if 'ingredients' in data or not self.partial:
+            ingredients = data.get('ingredients')
+            if not ingredients:
+                raise serializers.ValidationError(
+                    'Необходим хотя бы один ингредиент'
+                )
+            unique_ingredients = set(
+                ingredient['id'] for ingredient in ingredients)
+            if len(unique_ingredients) != len(ingredients):
+                raise serializers.ValidationError(
+                    'Ингредиенты должны быть уникальными!'
+                )
+        if 'tags' in data or not self.partial:
+            tags = data.get('tags')
+            if not tags:
+                raise serializers.ValidationError(
+                    'Необходим хотя бы один тег'
+                )
+            unique_tags = set(tag for tag in tags)
+            if len(unique_tags) != len(tags):
+                raise serializers.ValidationError(
+                    'Теги должны быть уникальными!'
+                )
+        return data
 
-        ingredients = self.initial_data.get('ingredients')
-        tags = self.initial_data.get('tags')
+    @staticmethod
+    def check_ingredients(ingredients):
+        """Проверка существования ингредиентов одним запросом"""
 
-        if not ingredients:
+        ids = {element['id'] for element in ingredients}
+        if Ingredient.objects.filter(id__in=ids).count() != len(ids):
             raise serializers.ValidationError(
-                'Необходим хотя бы один ингредиент'
+                'Нет такого ингредиента!'
             )
-        unique_ingredients = set(
-            ingredient['id'] for ingredient in ingredients)
-        if len(unique_ingredients) != len(ingredients):
-            raise serializers.ValidationError(
-                'Ингредиенты должны быть уникальными!'
-            )
-        if not tags:
-            raise serializers.ValidationError(
-                'Необходим хотя бы один тег'
-            )
-        unique_tags = set(tag for tag in tags)
-        if len(unique_tags) != len(tags):
-            raise serializers.ValidationError(
-                'Теги должны быть уникальными!'
-            )
-        return data
 
     def create_ingredients(self, ingredients, recipe):
         """Метод создания ингредиента"""
 
-        if not ingredients:
-            raise serializers.ValidationError(
-                'Рецепт должен содержать ингредиенты!'
-            )
-        ingredientsquantity = []
-        for element in ingredients:
-            id = element['id']
-            try:
-                ingredient = Ingredient.objects.get(pk=id)
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    'Нет такого ингредиента!'
-                )
-            amount = element['amount']
-            ingredientquantity = IngredientQuantity(
-                ingredient=ingredient, recipe=recipe, amount=amount
+        self.check_ingredients(ingredients)
+        IngredientQuantity.objects.bulk_create([
+            IngredientQuantity(
+                ingredient_id=element['id'], recipe=recipe,
+                amount=element['amount']
             )
-            ingredientsquantity.append(ingredientquantity)
-        IngredientQuantity.objects.bulk_create(ingredientsquantity)
+            for element in ingredients
+        ])
+
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Записывает только разницу с текущим составом рецепта.
+        Возвращает True, если состав изменился.
+        """
+
+        self.check_ingredients(ingredients)
+        amounts = {
+            element['id']: element['amount'] for element in ingredients}
+        current = {
+            row.ingredient_id: row for row in recipe.ingredient_list.all()}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientQuantity.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        IngredientQuantity.objects.bulk_update(changed, ('amount',))
+        added = [
+            IngredientQuantity(
+                ingredient_id=ingredient_id, recipe=recipe, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        IngredientQuantity.objects.bulk_create(added)
+        return bool(removed or changed or added)
 
     def create(self, validated_data):
         """Метод создания модели"""
@@ -216,18 +364,48 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data, author=user)
         self.create_ingredients(ingredients, recipe)
         recipe.tags.set(tags)
+        set_totals(recipe)
+        recipe.save(update_fields=TOTALS)
         return recipe
 
     def update(self, instance, validated_data):
-        """Метод обновления модели"""
-
-        IngredientQuantity.objects.filter(recipe=instance).delete()
-        TagInRecipe.objects.filter(recipe=instance).delete()
-
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
-        instance.tags.set(validated_data.pop('tags'))
-
-        return super().update(instance, validated_data)
+        """
+        Метод обновления модели с оптимистичной блокировкой:
+        версия правки повышается условным UPDATE, и если её уже
+        изменила параллельная правка, возвращается 409.
+        Пересчёт итогов и правки профиля автора или самих тегов
+        меняют только revision и правке не мешают.
+        Непереданные ингредиенты, теги и картинка не трогаются,
+        переданные сравниваются с текущими.
+        """
+        old_image = instance.image.name
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        # Итоги плана питания зависят от состава, тегов и времени.
+        plan_changed = validated_data.get(
+            'cooking_time', instance.cooking_time) != instance.cooking_time
+        with transaction.atomic():
+            # Строка заблокирована до конца транзакции: параллельная
+            # правка дождётся её и не найдёт прежнюю версию.
+            if not Recipe.objects.filter(
+                id=instance.id, version=instance.version
+            ).update(version=F('version') + 1):
+                raise EditConflict()
+            instance.version += 1
+
+            if ingredients is not None and self.update_ingredients(
+                    ingredients, instance):
+                set_totals(instance)
+                plan_changed = True
+            if tags is not None and set(tags) != set(instance.tags.all()):
+                instance.tags.set(tags)
+                plan_changed = True
+            instance = super().update(instance, validated_data)
+        if old_image and instance.image.name != old_image:
+            delete_files.delay(names=[old_image])
+        if plan_changed:
+            schedule_meal_plan_refresh(instance)
+        return instance
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
@@ -276,15 +454,18 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
 
 
 class ShoppingCartRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор добавления в избранное"""
+    """Сериализатор добавления в корзину"""
     class Meta:
         model = ShoppingCart
         fields = (
             'user',
-            'recipe'
+            'recipe',
+            'servings',
         )
 
     def validate(self, attrs):
+        if self.instance is not None:
+            return attrs
         user = attrs['user']
         recipe = attrs['recipe']
 
@@ -315,6 +496,7 @@ class SubscriptionSerializer(CustomUserSerializer):
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count',)
+        list_serializer_class = RelationsListSerializer
 
     def validate(self, attrs):
         author = self.instance
@@ -342,3 +524,47 @@ class SubscriptionSerializer(CustomUserSerializer):
     def get_recipes_count(self, obj):
         recipes = Recipe.objects.filter(author=obj)
         return recipes.count()
+
+
+class AuthorProfileSerializer(CustomUserSerializer):
+    """Профиль автора со счётчиками, посчитанными в запросе."""
+    recipes_count = serializers.IntegerField(read_only=True)
+    followers_count = serializers.IntegerField(read_only=True)
+    favorites_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name',
+                  'is_subscribed', 'recipes_count', 'followers_count',
+                  'favorites_count')
+
+
+class MealPlanEntrySerializer(serializers.ModelSerializer):
+    """Сериализатор записи плана питания"""
+    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
+
+    class Meta:
+        model = MealPlanEntry
+        fields = ('id', 'recipe', 'date', 'servings')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['recipe'] = ShortRecipeSerializer(
+            instance.recipe, context=self.context).data
+        return data
+
+
+class MealPlanMoveSerializer(serializers.Serializer):
+    """Перенос записи плана питания на другую дату"""
+    id = serializers.IntegerField()
+    date = serializers.DateField()
+    servings = serializers.IntegerField(min_value=1, required=False)
+
+
+class WeeklyMealPlanSerializer(serializers.ModelSerializer):
+    """Сериализатор итогов недели"""
+
+    class Meta:
+        model = WeeklyMealPlan
+        fields = ('week', 'recipes_count', 'cooking_time',
+                  'ingredients', 'tags')
@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Ingredient, IngredientQuantity, MealPlanEntry,
+                            Recipe, Tag, User)
+
+from .authentication import token_cache_key
+from .meal_plan import entry_weeks
+from .tasks import (refresh_ingredient_meal_plans, refresh_meal_plan_weeks,
+                    schedule_nutrition_refresh)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, update_fields, **kwargs):
+    """Пароль, активность или профиль могли измениться."""
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    cache.delete_many([
+        token_cache_key(key) for key in
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    ])
+
+
+def bump_revision(recipes):
+    """Новая версия рецептов сбрасывает их кеш, ETag и Last-Modified."""
+    recipes.update(revision=F('revision') + 1, updated=Now())
+
+
+@receiver(post_save, sender=User)
+def bump_author_recipes(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    bump_revision(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_tag_recipes(sender, instance, **kwargs):
+    bump_revision(Recipe.objects.filter(tags=instance))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_retagged_recipes(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """Теги рецепта меняются без Recipe.save(), например из админки."""
+    if reverse and action == 'pre_clear':
+        # После очистки рецепты тега уже не найти.
+        bump_revision(Recipe.objects.filter(tags=instance))
+    elif action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    elif not reverse:
+        bump_revision(Recipe.objects.filter(pk=instance.pk))
+    elif pk_set:
+        bump_revision(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_recipes(sender, instance, **kwargs):
+    bump_revision(Recipe.objects.filter(ingredients=instance))
+
+
+def ingredient_recipe_ids(ingredient):
+    return list(IngredientQuantity.objects.filter(
+        ingredient=ingredient).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_nutrition(sender, instance, created, **kwargs):
+    """Пищевая ценность или цена ингредиента могли измениться."""
+    if not created:
+        schedule_nutrition_refresh(ingredient_recipe_ids(instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_meal_plans_with_ingredient(sender, instance, created, **kwargs):
+    """Итоги недель хранят название и единицу ингредиента."""
+    if not created:
+        refresh_ingredient_meal_plans.delay(ingredient_id=instance.id)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def refresh_meal_plans_without_ingredient(sender, instance, **kwargs):
+    # Недели нужно найти до удаления состава; задача ставится
+    # в очередь после фиксации транзакции.
+    weeks = entry_weeks(MealPlanEntry.objects.filter(
+        recipe__ingredient_list__ingredient=instance))
+    if weeks:
+        refresh_meal_plan_weeks.delay(weeks=[
+            [user_id, week.isoformat()] for user_id, week in weeks])
+
+
+@receiver(pre_delete, sender=Ingredient)
+def refresh_nutrition_without_ingredient(sender, instance, **kwargs):
+    # Рецепты нужно найти до удаления состава, а пересчитать после.
+    recipe_ids = ingredient_recipe_ids(instance)
+    transaction.on_commit(lambda: schedule_nutrition_refresh(recipe_ids))
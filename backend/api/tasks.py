@@ -0,0 +1,106 @@
+import os
+import time
+from datetime import date
+
+from django.conf import settings
+
+from recipes import nutrition
+from recipes.models import MealPlanEntry, Recipe, User
+from tasks.queue import task
+
+from . import exports, meal_plan
+
+# Сколько секунд не удалять недавно загруженные или переиспользованные
+# картинки.
+DELETE_GRACE = 60 * 60
+
+
+@task
+def build_shopping_cart_export(user_id):
+    """Заранее собирает файл списка покупок для выдачи через nginx."""
+    user = User.objects.filter(id=user_id).first()
+    if user is not None:
+        exports.shopping_cart_export(user)
+
+
+@task
+def delete_files(names):
+    """
+    Удаляет файлы, на которые больше не ссылается ни один рецепт.
+    Файлы, изменённые позже DELETE_GRACE секунд до запроса ссылок,
+    не трогаются: ContentHashStorage мог только что выдать то же имя
+    рецепту, ещё не сохранённому в базе. Их уберёт gc_media.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    deadline = time.time() - DELETE_GRACE
+    referenced = set(Recipe.objects.filter(
+        image__in=names).values_list('image', flat=True))
+    for name in set(names) - referenced:
+        try:
+            if os.path.getmtime(storage.path(name)) > deadline:
+                continue
+        except FileNotFoundError:
+            continue
+        storage.delete(name)
+
+
+def schedule_shopping_cart_export(user):
+    if settings.USE_X_ACCEL_REDIRECT:
+        build_shopping_cart_export.delay(
+            user_id=user.id,
+            idempotency_key=(
+                f'shopping-cart-export:{user.id}:'
+                f'{exports.shopping_cart_version(user)}'
+            ),
+        )
+
+
+@task
+def refresh_meal_plan_weeks(weeks):
+    """Пересчёт итогов недель: список пар [user_id, 'YYYY-MM-DD']."""
+    # Пользователь мог быть удалён вместе со своими рецептами.
+    users = set(User.objects.filter(
+        id__in={user_id for user_id, _ in weeks}
+    ).values_list('id', flat=True))
+    for user_id, week in weeks:
+        if user_id in users:
+            meal_plan.refresh_week(user_id, date.fromisoformat(week))
+
+
+@task
+def refresh_recipe_meal_plans(recipe_id):
+    """Пересчёт недель, в которые запланирован изменённый рецепт."""
+    for user_id, week in meal_plan.entry_weeks(
+            MealPlanEntry.objects.filter(recipe_id=recipe_id)):
+        meal_plan.refresh_week(user_id, week)
+
+
+@task
+def refresh_ingredient_meal_plans(ingredient_id):
+    """
+    Пересчёт недель с рецептами, в которые входит изменённый
+    ингредиент: его название и единица хранятся в итогах недель.
+    """
+    for user_id, week in meal_plan.entry_weeks(MealPlanEntry.objects.filter(
+            recipe__ingredient_list__ingredient_id=ingredient_id)):
+        meal_plan.refresh_week(user_id, week)
+
+
+def schedule_meal_plan_refresh(recipe):
+    refresh_recipe_meal_plans.delay(
+        recipe_id=recipe.id,
+        idempotency_key=f'meal-plan-recipe:{recipe.id}:{recipe.revision}',
+    )
+
+
+@task
+def refresh_nutrition(recipe_ids):
+    """Пересчёт калорийности и стоимости рецептов."""
+    nutrition.refresh_recipes(recipe_ids)
+
+
+def schedule_nutrition_refresh(recipe_ids, chunk_size=1000):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), chunk_size):
+        refresh_nutrition.delay(
+            recipe_ids=recipe_ids[start:start + chunk_size])
@@ -0,0 +1,93 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class CostThrottle(BaseThrottle):
+    """
+    Token bucket с весом запросов.
+    У каждого клиента одна корзина на CAPACITY токенов, пополняемая
+    со скоростью REFILL_RATE токенов в секунду; запрос списывает
+    стоимость своего эндпоинта. Состояние хранится в кеше и общее
+    для всех воркеров; чтение и запись корзины идут под блокировкой
+    клиента на cache.add, так что параллельные запросы не тратят
+    одни и те же токены. Стоимость ищется в COSTS по ключам
+    '<scope>.<action>', '<scope>' и 'default', где scope —
+    атрибут throttle_scope вьюсета или действия.
+    """
+    cache = cache
+    cache_format = 'throttle:{}'
+    timer = time.time
+    # Блокировка держится микросекунды; таймаут страхует от упавшего
+    # воркера, ожидание — от редкой гонки запросов одного клиента.
+    lock_timeout = 1
+    lock_attempts = 20
+    lock_delay = 0.005
+
+    def __init__(self):
+        config = settings.THROTTLING
+        self.capacity = config['CAPACITY']
+        self.rate = config['REFILL_RATE']
+        self.costs = config['COSTS']
+        self.wait_time = None
+
+    def get_cost(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        action = getattr(view, 'action', None)
+        for key in (f'{scope}.{action}', scope):
+            if key in self.costs:
+                return self.costs[key]
+        return self.costs.get('default', 1)
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return self.cache_format.format(f'user:{request.user.pk}')
+        return self.cache_format.format(f'ip:{self.get_ident(request)}')
+
+    def acquire(self, lock):
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock, 1, self.lock_timeout):
+                return True
+            time.sleep(self.lock_delay)
+        return False
+
+    def allow_request(self, request, view):
+        cost = self.get_cost(view)
+        key = self.get_cache_key(request)
+        lock = f'{key}:lock'
+        if self.acquire(lock):
+            try:
+                now = self.timer()
+                tokens, stamp = self.cache.get(key, (self.capacity, now))
+                tokens = min(
+                    self.capacity, tokens + (now - stamp) * self.rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                else:
+                    self.wait_time = (cost - tokens) / self.rate
+                self.cache.set(
+                    key, (tokens, now), math.ceil(self.capacity / self.rate))
+            finally:
+                self.cache.delete(lock)
+        else:
+            # Корзину клиента слишком долго держат его же запросы.
+            tokens, allowed = 0, False
+            self.wait_time = self.lock_timeout
+        # Заголовки с остатком бюджета проставляет RateLimitMiddleware.
+        getattr(request, '_request', request).rate_limit = {
+            'X-RateLimit-Limit': self.capacity,
+            'X-RateLimit-Remaining': int(tokens),
+            'X-RateLimit-Cost': cost,
+        }
+        return allowed
+
+    def wait(self):
+        # Retry-After в целых секундах и не меньше одной: при нуле
+        # DRF не отдал бы заголовок вовсе.
+        if self.wait_time is None:
+            return None
+        return max(1, math.ceil(self.wait_time))
@@ -2,7 +2,7 @@ from rest_framework import routers
 from django.urls import path, include
 
 from .views import (RecipeViewSet, IngredientViewSet,
-                    TagViewSet, CustomUserViewSet)
+                    TagViewSet, CustomUserViewSet, MealPlanViewSet)
 
 app_name = 'api'
 
@@ -12,6 +12,7 @@ v1_router.register(r'tags', TagViewSet, basename='tags')
 v1_router.register(r'recipes', RecipeViewSet, basename='recipes')
 v1_router.register(r'users', CustomUserViewSet, basename='users')
 v1_router.register(r'ingredients', IngredientViewSet, basename='ingredients')
+v1_router.register(r'meal_plan', MealPlanViewSet, basename='meal_plan')
 
 urlpatterns = [
     path('', include(v1_router.urls)),
@@ -1,31 +1,63 @@
-from api import filters
+from api import deletion, exports, filters, meal_plan, tasks
 from api.serializers import (
-    FavoriteRecipeSerializer, CreateRecipeSerializer, CustomUserSerializer,
-    IngredientQuantity, IngredientSerializer, RecipeSerializer,
-    SubscriptionSerializer, TagSerializer, ShoppingCartRecipeSerializer
+    AuthorProfileSerializer, FavoriteRecipeSerializer,
+    CreateRecipeSerializer, CustomUserSerializer,
+    FlatRecipeSerializer, IngredientSerializer, MealPlanEntrySerializer,
+    MealPlanMoveSerializer, RecipeSerializer, SubscriptionSerializer,
+    TagFacetSerializer, TagSerializer, ShoppingCartRecipeSerializer,
+    WeeklyMealPlanSerializer
 )
-from django.db.models import Sum
-from django.http import HttpResponse
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser import utils as djoser_utils
 from djoser.views import UserViewSet
+from recipes import nutrition
 from recipes.models import (
-    User, Tag, Ingredient, Recipe, Subscription, FavoriteRecipe, ShoppingCart
+    User, Tag, Ingredient, Recipe, Subscription, FavoriteRecipe, ShoppingCart,
+    MealPlanEntry
 )
-from rest_framework import status, viewsets
+from rest_framework import mixins, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from .caching import recipe_data
+from .conditional import (if_match_passes, not_modified_response,
+                          recipe_validators, recipes_validators,
+                          set_validators)
+from .exceptions import PreconditionFailed
 from .permissions import IsAdminIsOwnerOrReadOnly
 
 
+def count_by_user(queryset, field):
+    """Подзапрос с числом строк queryset, у которых field = pk автора."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('*')).values('count')
+    ), 0)
+
+
 class CustomUserViewSet(UserViewSet):
     """Вьюсет для работы с User"""
 
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [IsAdminIsOwnerOrReadOnly, ]
+    throttle_scope = 'users'
+
+    def perform_destroy(self, instance):
+        if instance == self.request.user:
+            djoser_utils.logout_user(self.request)
+        deletion.delete_user(instance)
 
     @action(
         detail=False,
@@ -49,6 +81,31 @@ class CustomUserViewSet(UserViewSet):
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=('get',), permission_classes=(AllowAny,))
+    def profile(self, request, id):
+        """
+        Страница автора: профиль, счётчики и первая страница рецептов.
+        Счётчики считаются подзапросами в запросе автора, флаги
+        подписки и рецептов загружаются пачкой.
+        """
+        author = get_object_or_404(User.objects.annotate(
+            recipes_count=count_by_user(Recipe.objects, 'author'),
+            followers_count=count_by_user(Subscription.objects, 'author'),
+            favorites_count=count_by_user(
+                FavoriteRecipe.objects, 'recipe__author'),
+        ), id=id)
+        data = AuthorProfileSerializer(
+            author, context={'request': request}).data
+        recipes = Recipe.objects.filter(author=author).order_by('-created')
+        page = self.paginate_queryset(recipes)
+        serializer_class = (FlatRecipeSerializer
+                            if settings.FLAT_SERIALIZATION
+                            else RecipeSerializer)
+        data['recipes'] = self.get_paginated_response(serializer_class(
+            page, many=True, context={'request': request}
+        ).data).data
+        return Response(data)
+
     @action(
         detail=True,
         methods=('post', ),
@@ -108,6 +165,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    throttle_scope = 'tags'
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -120,18 +178,22 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = filters.IngredientFilter
     search_fields = ('^name',)
     pagination_class = None
+    throttle_scope = 'ingredients'
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all().order_by('-created')
     filterset_class = filters.RecipeFilter
     permission_classes = [IsAdminIsOwnerOrReadOnly]
+    throttle_scope = 'recipes'
 
     def get_serializer_class(self):
         """Вызов определенного сериализатора взависимости от action"""
         if self.action in ('list', 'retrieve'):
+            if settings.FLAT_SERIALIZATION:
+                return FlatRecipeSerializer
             return RecipeSerializer
-        elif self.action in ('create', 'partial_update'):
+        elif self.action in ('create', 'update', 'partial_update'):
             return CreateRecipeSerializer
 
     def get_serializer_context(self):
@@ -139,12 +201,82 @@ class RecipeViewSet(viewsets.ModelViewSet):
         context.update({'request': self.request})
         return context
 
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов с поддержкой условного GET только по ETag:
+        удаление или перестановка рецептов не сдвигает max(updated),
+        поэтому Last-Modified для списка не отдаётся.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset) if page is None else page
+        etag, _ = recipes_validators(
+            request, recipes,
+            self.paginator.count if page is not None else len(recipes)
+        )
+        not_modified = not_modified_response(request, etag, None)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, None)
+        serializer = self.get_serializer(recipes, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return set_validators(response, etag, None)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с поддержкой условного GET."""
+        recipe = self.get_object()
+        etag, last_modified = recipe_validators(request, recipe)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+        data = recipe_data(request, recipe, self.get_serializer_class())
+        return set_validators(Response(data), etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        """
+        Изменение рецепта. С заголовком If-Match правка применяется,
+        только если клиент видел текущую версию правки рецепта, иначе 412.
+        В ответе новый ETag для следующей правки.
+        """
+        recipe = self.get_object()
+        if not if_match_passes(request, recipe):
+            raise PreconditionFailed()
+        serializer = self.get_serializer(
+            recipe, data=request.data, partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        etag, _ = recipe_validators(request, serializer.instance)
+        return set_validators(Response(serializer.data), etag, None)
+
+    def perform_destroy(self, instance):
+        deletion.delete_recipes([instance.id])
+
+    @action(detail=False, methods=('get',), permission_classes=(AllowAny,))
+    def facets(self, request):
+        """
+        Число рецептов по каждому тегу при текущих фильтрах.
+        Фильтр по тегам не учитывается: счётчик показывает, сколько
+        рецептов добавит выбор тега. Считается одним GROUP BY.
+        """
+        params = request.query_params.copy()
+        params.pop('tags', None)
+        filterset = self.filterset_class(
+            params, self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise serializers.ValidationError(filterset.errors)
+        tags = Tag.objects.annotate(recipes_count=Count(
+            'recipe', filter=Q(recipe__in=filterset.qs.values('id'))))
+        return Response(TagFacetSerializer(tags, many=True).data)
+
     @staticmethod
-    def add_recipe_to(serializer, request, pk):
+    def add_recipe_to(serializer, request, pk, **extra):
         serializer = serializer(
             data={
                 'user': request.user.id,
-                'recipe': pk
+                'recipe': pk,
+                **extra
             },
             context={'request': request}
         )
@@ -186,21 +318,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def shopping_cart(self, request, pk):
-        return self.add_recipe_to(ShoppingCartRecipeSerializer, request, pk)
+        extra = {}
+        if 'servings' in request.data:
+            extra['servings'] = request.data['servings']
+        response = self.add_recipe_to(
+            ShoppingCartRecipeSerializer, request, pk, **extra)
+        if response.status_code == status.HTTP_201_CREATED:
+            tasks.schedule_shopping_cart_export(request.user)
+        return response
+
+    @shopping_cart.mapping.patch
+    def update_shopping_cart(self, request, pk):
+        """Изменение числа порций рецепта в корзине."""
+        item = get_object_or_404(ShoppingCart, user=request.user, recipe=pk)
+        serializer = ShoppingCartRecipeSerializer(
+            item, data={'servings': request.data.get('servings')},
+            partial=True, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        tasks.schedule_shopping_cart_export(request.user)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        return self.delete_recipe_from(ShoppingCart, request, pk)
-
-    def ingredients_to_txt(self, ingredients):
-        shopping_list = ''
-        for ingredient in ingredients:
-            shopping_list += (
-                f"{ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']}) - "
-                f"{ingredient['sum']}\n"
-            )
-        return shopping_list
+        response = self.delete_recipe_from(ShoppingCart, request, pk)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            tasks.schedule_shopping_cart_export(request.user)
+        return response
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart_totals',
+        url_name='shopping_cart_totals',
+    )
+    def shopping_cart_totals(self, request):
+        """Калорийность, БЖУ и стоимость корзины с учётом порций."""
+        return Response(nutrition.cart_totals(request.user))
 
     @action(
         detail=False,
@@ -210,11 +366,103 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        ingredients = IngredientQuantity.objects.filter(
-            recipe__shoppingcart_related_recipe__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        shopping_list = self.ingredients_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type='text/plain')
+        if settings.USE_X_ACCEL_REDIRECT:
+            response = HttpResponse(content_type='text/plain')
+            response['X-Accel-Redirect'] = (
+                settings.EXPORTS_INTERNAL_URL
+                + exports.shopping_cart_export(request.user)
+            )
+            return response
+        if isinstance(request._request, ASGIRequest):
+            # Потоковый ответ Django под ASGI перебирает в цикле событий,
+            # где запросы к БД запрещены, поэтому список собирается здесь,
+            # в потоке синхронной вьюхи.
+            return HttpResponse(
+                ''.join(exports.shopping_cart_lines(request.user)),
+                content_type='text/plain'
+            )
+        return StreamingHttpResponse(
+            exports.shopping_cart_lines(request.user),
+            content_type='text/plain'
+        )
+
+
+class MealPlanViewSet(mixins.ListModelMixin,
+                      mixins.DestroyModelMixin,
+                      viewsets.GenericViewSet):
+    """
+    План питания пользователя: записи недели, пакетное добавление
+    и перенос, итоги недели из предрассчитанной таблицы.
+    """
+
+    serializer_class = MealPlanEntrySerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+    filter_backends = ()
+    throttle_scope = 'meal_plan'
+
+    def get_date(self):
+        """Дата из ?week=YYYY-MM-DD, по умолчанию сегодня."""
+        value = self.request.query_params.get('week')
+        if not value:
+            return timezone.localdate()
+        return serializers.DateField().to_internal_value(value)
+
+    def get_queryset(self):
+        queryset = MealPlanEntry.objects.filter(
+            user=self.request.user).select_related('recipe')
+        if self.action == 'list':
+            week = meal_plan.week_start(self.get_date())
+            queryset = queryset.filter(
+                date__gte=week, date__lt=week + timedelta(days=7))
+        return queryset
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            entries = MealPlanEntry.objects.bulk_create([
+                MealPlanEntry(user=request.user, **item)
+                for item in serializer.validated_data
+            ])
+            meal_plan.refresh_weeks(
+                request.user.id, [entry.date for entry in entries])
+        return Response(
+            self.get_serializer(entries, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=('patch',))
+    def move(self, request):
+        """Перенос записей на другие даты и изменение числа порций."""
+        serializer = MealPlanMoveSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        changes = {item['id']: item for item in serializer.validated_data}
+        with transaction.atomic():
+            entries = list(self.get_queryset().filter(
+                id__in=changes).select_for_update(of=('self',)))
+            if len(entries) != len(changes):
+                return Response(
+                    {'errors': 'Записи плана не найдены'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            dates = [entry.date for entry in entries]
+            for entry in entries:
+                entry.date = changes[entry.id]['date']
+                entry.servings = changes[entry.id].get(
+                    'servings', entry.servings)
+            MealPlanEntry.objects.bulk_update(entries, ('date', 'servings'))
+            meal_plan.refresh_weeks(
+                request.user.id, dates + [entry.date for entry in entries])
+        return Response(self.get_serializer(entries, many=True).data)
+
+    @action(detail=False, methods=('get',))
+    def week(self, request):
+        """Итоги недели: ингредиенты, время приготовления, теги."""
+        weekly = meal_plan.get_week(request.user.id, self.get_date())
+        return Response(WeeklyMealPlanSerializer(weekly).data)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            meal_plan.refresh_weeks(instance.user_id, [instance.date])
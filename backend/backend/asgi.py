@@ -7,10 +7,16 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import gc
 import os
 
 from django.core.asgi import get_asgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Предзагрузка как в wsgi.py: модули один раз в мастере gunicorn.
+get_resolver().url_patterns
+gc.freeze()
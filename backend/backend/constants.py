@@ -6,3 +6,9 @@ MEASUREMENT_LENGHT = 200
 PECIPE_NAME = 200
 MIN_COOKING_TIME = 1
 MIN_AMOUNT = 1
+MIN_SERVINGS = 1
+# Единицы, приводимые к базовой в списке покупок: единица -> (база, множитель)
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
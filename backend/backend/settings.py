@@ -29,10 +29,13 @@ INSTALLED_APPS = [
     'djoser',
     'recipes',
     'rest_framework.authtoken',
+    'tasks',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.RateLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,6 +82,46 @@ DATABASES = {
 #     }
 # }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Время жизни закешированного пользователя по токену (в секундах).
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+# Кеш в памяти процесса не виден другим воркерам: сброс при logout или
+# смене пароля дошёл бы только до одного из них. Поэтому пользователь
+# по токену кешируется только при общем бэкенде (memcached, redis).
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+TOKEN_AUTHENTICATION_CLASS = (
+    'api.authentication.CachedTokenAuthentication' if SHARED_CACHE
+    else 'rest_framework.authentication.TokenAuthentication'
+)
+
+# Время жизни общей части ответа рецепта; ключ содержит версию рецепта.
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Очередь фоновых задач. Для Redis:
+# TASKS_BACKEND=tasks.backends.RedisBackend, TASKS_REDIS_URL=redis://...
+TASKS = {
+    'BACKEND': os.getenv('TASKS_BACKEND', 'tasks.backends.DatabaseBackend'),
+    'OPTIONS': (
+        {'url': os.getenv('TASKS_REDIS_URL')}
+        if os.getenv('TASKS_REDIS_URL') else {}
+    ),
+    'EAGER': os.getenv('TASKS_EAGER', 'False') == 'True',
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    # Сколько хранить завершённые задачи и их ключи идемпотентности, с.
+    'RETENTION': 60 * 60 * 24,
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -119,6 +162,17 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# Картинки именуются по хэшу содержимого: дубликаты не пишутся на диск.
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentHashStorage'
+
+# Ответы короче этого размера (в байтах) не сжимаются.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 200))
+
+# Готовые файлы выгрузок; при USE_X_ACCEL_REDIRECT их отдаёт nginx
+# из internal-локации EXPORTS_INTERNAL_URL.
+EXPORTS_ROOT = os.getenv('EXPORTS_ROOT', os.path.join(BASE_DIR, 'exports'))
+EXPORTS_INTERNAL_URL = '/protected/exports/'
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', 'False') == 'True'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -130,7 +184,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        TOKEN_AUTHENTICATION_CLASS,
     ],
     "DEFAULT_PAGINATION_CLASS":
         "rest_framework.pagination.LimitOffsetPagination",
@@ -138,8 +192,35 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttles.CostThrottle',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Бюджет запросов клиента (token bucket) и стоимость эндпоинтов.
+THROTTLING = {
+    'CAPACITY': int(os.getenv('THROTTLE_CAPACITY', 300)),
+    'REFILL_RATE': float(os.getenv('THROTTLE_REFILL_RATE', 5)),
+    'COSTS': {
+        'default': 1,
+        'tags': 1,
+        'ingredients': 2,
+        'recipes.create': 20,
+        'recipes.update': 20,
+        'recipes.partial_update': 20,
+        'recipes.download_shopping_cart': 30,
+        'users.create': 10,
+    },
+}
+
+# Сборка ответов со списками рецептов напрямую из .values(),
+# минуя поля ModelSerializer.
+FLAT_SERIALIZATION = os.getenv('FLAT_SERIALIZATION', 'True') == 'True'
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -153,6 +234,6 @@ DJOSER = {
         'current_user': 'api.serializers.CustomUserSerializer',
     },
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'djoser.authentication.TokenAuthentication',
+        TOKEN_AUTHENTICATION_CLASS,
     ],
 }
@@ -7,10 +7,20 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Импорт urlconf подтягивает вьюсеты, сериализаторы и фильтры. С
+# gunicorn --preload это происходит один раз в мастере, а воркеры
+# получают готовые модули через fork вместо импорта на первом запросе.
+get_resolver().url_patterns
+# Объекты, созданные при загрузке, исключаются из сборки мусора: её
+# проходы в воркерах не пишут в эти страницы и не ломают copy-on-write.
+gc.freeze()
@@ -0,0 +1,49 @@
+"""
+Настройки gunicorn.
+
+Режим задаётся переменной GUNICORN_WORKER_CLASS: sync, gthread или
+uvicorn (ASGI). Число воркеров и потоков по умолчанию выводится из
+числа CPU и переопределяется GUNICORN_WORKERS и GUNICORN_THREADS.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+mode = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if mode not in WORKER_CLASSES:
+    raise ValueError(
+        f'GUNICORN_WORKER_CLASS: {mode!r}, ожидается одно из '
+        f'{", ".join(WORKER_CLASSES)}')
+cpus = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+worker_class = WORKER_CLASSES[mode]
+wsgi_app = ('backend.asgi:application' if mode == 'uvicorn'
+            else 'backend.wsgi:application')
+# Синхронный воркер простаивает на вводе-выводе, поэтому их больше;
+# gthread и uvicorn закрывают ожидание потоками и циклом событий.
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', cpus * 2 + 1 if mode == 'sync' else cpus + 1))
+threads = int(os.getenv(
+    'GUNICORN_THREADS', 4 if mode == 'gthread' else 1))
+
+# Приложение загружается в мастере до fork, см. backend/wsgi.py.
+preload_app = True
+
+# Воркер перезапускается после случайного числа запросов из
+# [max_requests, max_requests + jitter], чтобы утечки памяти не росли
+# бесконечно, а воркеры не перезапускались одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Список покупок отдаётся потоком: у sync-воркера на время отдачи нет
+# heartbeat, поэтому timeout должен покрывать самую длинную выгрузку.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
@@ -0,0 +1,87 @@
+"""
+Матрица производительности режимов gunicorn на засеянной базе.
+
+Для каждого режима из gunicorn.conf.py запускает сервер, прогоняет
+сценарий locustfile.py без интерфейса и печатает пропускную способность
+и перцентили задержки:
+    python loadtest/bench_matrix.py --users 100 --run-time 2m
+
+Запускать из каталога backend после loadcsv и seed_load.
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+MODES = ('sync', 'gthread', 'uvicorn')
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f'Сервер не ответил за {timeout} с: {url}')
+
+
+def run_mode(mode, options, workdir):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=mode,
+               GUNICORN_BIND=f'127.0.0.1:{options.port}')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    host = f'http://127.0.0.1:{options.port}'
+    try:
+        wait_ready(f'{host}/api/tags/')
+        prefix = os.path.join(workdir, mode)
+        subprocess.run(
+            [sys.executable, '-m', 'locust',
+             '-f', os.path.join(HERE, 'locustfile.py'),
+             '--host', host, '--headless', '--only-summary',
+             '-u', str(options.users), '-r', str(options.spawn_rate),
+             '-t', options.run_time, '--csv', prefix],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        server.terminate()
+        server.wait()
+    with open(f'{prefix}_stats.csv', encoding='utf-8') as stats:
+        for row in csv.DictReader(stats):
+            if row['Name'] == 'Aggregated':
+                return row
+    raise RuntimeError(f'Нет сводной строки в {prefix}_stats.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--modes', nargs='*', default=MODES)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--spawn-rate', type=int, default=10)
+    parser.add_argument('--run-time', default='1m')
+    parser.add_argument('--port', type=int, default=8090)
+    options = parser.parse_args()
+
+    print(f'{"режим":<10}{"запр/с":>10}{"ошибок":>10}'
+          f'{"p50":>8}{"p95":>8}{"p99":>8}')
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in options.modes:
+            row = run_mode(mode, options, workdir)
+            print(
+                f'{mode:<10}{float(row["Requests/s"]):>10.1f}'
+                f'{row["Failure Count"]:>10}{row["50%"]:>8}'
+                f'{row["95%"]:>8}{row["99%"]:>8}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Сценарий нагрузочного тестирования API Фудграма.
+
+Данные готовятся командами loadcsv и seed_load, затем:
+    pip install locust
+    locust -f loadtest/locustfile.py --host http://localhost:8000 \
+        --headless -u 100 -r 10 -t 5m
+
+SEED_USERS — число пользователей, созданных seed_load.
+"""
+import os
+import random
+
+from locust import HttpUser, between, events, task
+
+SEED_USERS = int(os.getenv('SEED_USERS', 1000))
+SEED_PASSWORD = os.getenv('SEED_PASSWORD', 'seed-password')
+SEARCH_PREFIXES = ('а', 'бе', 'кар', 'мо', 'сы', 'ябл', 'хл', 'пом')
+TAGS = ('breakfast', 'lanch', 'dinner')
+
+
+class FoodgramUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        response = self.client.post('/api/auth/token/login/', json={
+            'email': f'seed{random.randint(1, SEED_USERS)}@example.com',
+            'password': SEED_PASSWORD,
+        }, name='/api/auth/token/login/')
+        token = response.json().get('auth_token')
+        if token:
+            self.client.headers['Authorization'] = f'Token {token}'
+        self.recipe_ids = []
+
+    @task(10)
+    def browse_feed(self):
+        offset = random.choice((0, 0, 0, 6, 12, 60))
+        response = self.client.get(
+            f'/api/recipes/?limit=6&offset={offset}',
+            name='/api/recipes/?limit=6&offset=[n]')
+        if response.ok:
+            self.recipe_ids = [
+                recipe['id'] for recipe in response.json()['results']]
+
+    @task(4)
+    def browse_tag(self):
+        self.client.get(
+            f'/api/recipes/?tags={random.choice(TAGS)}',
+            name='/api/recipes/?tags=[slug]')
+
+    @task(5)
+    def open_recipe(self):
+        if self.recipe_ids:
+            self.client.get(
+                f'/api/recipes/{random.choice(self.recipe_ids)}/',
+                name='/api/recipes/[id]/')
+
+    @task(6)
+    def autocomplete(self):
+        prefix = random.choice(SEARCH_PREFIXES)
+        for length in range(1, len(prefix) + 1):
+            self.client.get(
+                f'/api/ingredients/?name={prefix[:length]}',
+                name='/api/ingredients/?name=[prefix]')
+
+    @task(2)
+    def toggle_favorite(self):
+        if self.recipe_ids:
+            recipe_id = random.choice(self.recipe_ids)
+            with self.client.post(
+                f'/api/recipes/{recipe_id}/favorite/',
+                name='/api/recipes/[id]/favorite/', catch_response=True
+            ) as response:
+                if response.status_code == 400:
+                    response.success()
+                    self.client.delete(
+                        f'/api/recipes/{recipe_id}/favorite/',
+                        name='/api/recipes/[id]/favorite/')
+
+    @task(1)
+    def download_shopping_cart(self):
+        if self.recipe_ids:
+            with self.client.post(
+                f'/api/recipes/{random.choice(self.recipe_ids)}'
+                '/shopping_cart/',
+                name='/api/recipes/[id]/shopping_cart/', catch_response=True
+            ) as response:
+                if response.status_code == 400:
+                    response.success()
+        self.client.get('/api/recipes/download_shopping_cart/')
+
+
+@events.quitting.add_listener
+def report_percentiles(environment, **kwargs):
+    """Сводка p50/p95/p99 по каждому эндпоинту."""
+    stats = environment.stats
+    print(f'\n{"Эндпоинт":<48}{"запросов":>10}{"p50":>8}{"p95":>8}{"p99":>8}')
+    for entry in sorted(stats.entries.values(), key=lambda e: e.name):
+        print(
+            f'{entry.method + " " + entry.name:<48}{entry.num_requests:>10}'
+            f'{entry.get_response_time_percentile(0.5):>8.0f}'
+            f'{entry.get_response_time_percentile(0.95):>8.0f}'
+            f'{entry.get_response_time_percentile(0.99):>8.0f}'
+        )
@@ -1,26 +1,100 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import ModelAdmin, display, register
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from api.deletion import (delete_recipes, delete_user, recipe_deletion_counts,
+                          user_deletion_counts)
+from api.tasks import schedule_meal_plan_refresh
 
 from .models import (User, Tag, Ingredient, Recipe, Subscription,
-                     FavoriteRecipe, ShoppingCart)
+                     FavoriteRecipe, ShoppingCart, MealPlanEntry)
+
+ESTIMATED_COUNT_THRESHOLD = 100000
+DELETED_OBJECTS_LIMIT = 20
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с оценкой числа строк из статистики PostgreSQL
+    вместо COUNT(*) для больших нефильтрованных таблиц.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if (query is not None and not query.where
+                and connection.vendor == 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        if query is not None and query.annotations:
+            # Подзапросы-аннотации списка не меняют число строк, а в
+            # COUNT(*) Django 3.2 вычислял бы их для всей таблицы.
+            return query.model._default_manager.filter(
+                pk__in=self.object_list.values('pk')).count()
+        return super().count
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Базовая админка для больших таблиц."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class BulkDeleteAdmin(LargeTableAdmin):
+    """
+    Админка моделей, удаляемых прямыми DELETE из api.deletion.
+    Страница подтверждения показывает число строк по моделям
+    из deletion_counts, а не дерево объектов от сборщика каскадов.
+    """
+    deletion_counts = None
+
+    def get_deleted_objects(self, objs, request):
+        pks = (objs.values('pk') if hasattr(objs, 'values')
+               else [obj.pk for obj in objs])
+        counts = self.deletion_counts(
+            self.model._default_manager.filter(pk__in=pks))
+        deleted_objects = [str(obj) for obj in objs[:DELETED_OBJECTS_LIMIT]]
+        rest = counts[self.model] - len(deleted_objects)
+        if rest > 0:
+            deleted_objects.append(f'… и ещё {rest}')
+        model_count = {
+            model._meta.verbose_name_plural: count
+            for model, count in counts.items() if count
+        }
+        perms_needed = (
+            set() if self.has_delete_permission(request)
+            else {self.model._meta.verbose_name}
+        )
+        return deleted_objects, model_count, perms_needed, []
 
 
 @register(Ingredient)
-class IngredientAdmin(ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     list_display = (
         'name', 'measurement_unit',
     )
     search_fields = (
-        'name',
+        '^name',
     )
     list_filter = (
-        'name',
+        'measurement_unit',
     )
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(BulkDeleteAdmin):
+    deletion_counts = staticmethod(recipe_deletion_counts)
     list_display = (
-        'name', 'author',
+        'name', 'author', 'favorites_count',
     )
     fields = (
         ('name', 'cooking_time',),
@@ -29,13 +103,49 @@ class RecipeAdmin(ModelAdmin):
         ('image',),
     )
     raw_id_fields = ('author', )
+    autocomplete_fields = ('tags', )
+    list_select_related = ('author', )
     search_fields = (
-        'name', 'author',
+        '^name', '^author__username',
     )
     list_filter = (
-        'name', 'author__username',
+        'tags',
     )
 
+    def get_queryset(self, request):
+        # Коррелированный подзапрос считается только для строк страницы,
+        # в отличие от GROUP BY по всему соединению с избранным.
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(
+                FavoriteRecipe.objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    count=Count('*')).values('count')
+            ), 0))
+
+    def save_model(self, request, obj, form, change):
+        # Правка из админки, как и через API, сбивает If-Match
+        # у открытых у клиентов копий рецепта.
+        if change:
+            obj.version = F('version') + 1
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=('version',))
+            # Итоги плана питания зависят от времени и тегов; задача
+            # ставится после фиксации, когда теги уже сохранены.
+            if {'cooking_time', 'tags'} & set(form.changed_data):
+                schedule_meal_plan_refresh(obj)
+
+    def delete_model(self, request, obj):
+        delete_recipes([obj.id])
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset.values_list('id', flat=True))
+
+    @display(description='В избранном', ordering='favorites_count')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
 
 @register(Tag)
 class TagAdmin(ModelAdmin):
@@ -48,25 +158,45 @@ class TagAdmin(ModelAdmin):
 
 
 @register(User)
-class MyUserAdmin(ModelAdmin):
+class MyUserAdmin(BulkDeleteAdmin):
+    deletion_counts = staticmethod(user_deletion_counts)
 
     list_display = ('pk', 'username', 'email', 'first_name', 'last_name',)
-    list_filter = ('username', 'email')
-    search_fields = ('username', 'email')
+    list_filter = ('is_active', 'is_staff')
+    search_fields = ('^username', '^email')
+
+    def delete_model(self, request, obj):
+        delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
 
 
 @register(ShoppingCart)
-class ShoppingCartAdmin(ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
 
 
 @register(Subscription)
-class FollowAdmin(ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
 
 
 @register(FavoriteRecipe)
-class FavoriteAdmin(ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
+
+
+@register(MealPlanEntry)
+class MealPlanEntryAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'date', 'recipe', 'servings')
+    list_select_related = ('user', 'recipe')
+    raw_id_fields = ('user', 'recipe')
@@ -0,0 +1,52 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+# Индексы под поиск в админке: istartswith строится как
+# UPPER(col::text) LIKE UPPER('...%'), нужен функциональный индекс.
+UPPER_PATTERN_INDEXES = (
+    ('recipes_user_username_upper_idx', 'recipes_user', 'username'),
+    ('recipes_user_email_upper_idx', 'recipes_user', 'email'),
+    ('recipes_recipe_name_upper_idx', 'recipes_recipe', 'name'),
+    ('recipes_ingredient_name_upper_idx', 'recipes_ingredient', 'name'),
+)
+
+
+def create_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in UPPER_PATTERN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'(UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in UPPER_PATTERN_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_pattern_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientquantity',
+            index=models.Index(fields=['recipe'], include=('ingredient', 'amount'), name='ingredientquantity_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-created'], name='recipe_author_created_idx'),
+        ),
+        migrations.RunPython(create_upper_indexes, drop_upper_indexes),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+def normalize_name(value):
+    # Копия recipes.search.normalize_name на момент миграции: её правки
+    # не должны менять то, что делает уже применённая миграция.
+    return ' '.join(value.lower().replace('ё', 'е').split())
+
+
+def fill_search_name(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ingredients = []
+    for ingredient in Ingredient.objects.only('id', 'name').iterator():
+        ingredient.search_name = normalize_name(ingredient.name)
+        ingredients.append(ingredient)
+    Ingredient.objects.bulk_update(
+        ingredients, ['search_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=200, verbose_name='Название для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_pattern_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['search_name'], name='ingredient_search_name_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+    ]
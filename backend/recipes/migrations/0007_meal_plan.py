@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppingcart_servings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPlanEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('servings', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, message='Минимум одна порция!')], verbose_name='Порций')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_plan', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись плана питания',
+                'verbose_name_plural': 'План питания',
+                'ordering': ('date', 'id'),
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyMealPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(verbose_name='Понедельник недели')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('cooking_time', models.PositiveIntegerField(default=0, verbose_name='Время приготовления')),
+                ('ingredients', models.JSONField(default=list, verbose_name='Ингредиенты')),
+                ('tags', models.JSONField(default=dict, verbose_name='Теги')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Пересчитан')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_meal_plans', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итоги недели',
+                'verbose_name_plural': 'Итоги недель',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mealplanentry',
+            index=models.Index(fields=['user', 'date'], name='mealplanentry_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklymealplan',
+            constraint=models.UniqueConstraint(fields=('user', 'week'), name='unique_user_week'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.db import migrations
+
+# Поиск ингредиента по вхождению строится как LIKE '%...%': его
+# обслуживает только триграммный GIN-индекс, а не varchar_pattern_ops.
+TRIGRAM_INDEX = 'ingredient_search_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{TRIGRAM_INDEX}" ON '
+        f'"recipes_ingredient" USING gin ("search_name" gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{TRIGRAM_INDEX}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_nutrition'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
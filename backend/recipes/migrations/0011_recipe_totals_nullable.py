@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+# Поле ингредиента -> итоговое поле рецепта, как в recipes.nutrition.
+NUTRIENTS = {
+    'calories': 'calories',
+    'proteins': 'proteins',
+    'fats': 'fats',
+    'carbohydrates': 'carbohydrates',
+    'price': 'cost',
+}
+
+
+def reset_incomplete_totals(apps, schema_editor):
+    # Итоги, где недостающие данные были посчитаны нулями, неизвестны.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field, total in NUTRIENTS.items():
+        Recipe.objects.filter(**{
+            f'ingredient_list__ingredient__{field}__isnull': True
+        }).update(**{total: None, 'revision': F('revision') + 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='calories',
+            field=models.FloatField(db_index=True, editable=False, null=True, verbose_name='Калории, ккал'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='proteins',
+            field=models.FloatField(editable=False, null=True, verbose_name='Белки, г'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='fats',
+            field=models.FloatField(editable=False, null=True, verbose_name='Жиры, г'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='carbohydrates',
+            field=models.FloatField(editable=False, null=True, verbose_name='Углеводы, г'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='cost',
+            field=models.FloatField(editable=False, null=True, verbose_name='Стоимость, руб.'),
+        ),
+        migrations.RunPython(reset_incomplete_totals, migrations.RunPython.noop),
+    ]
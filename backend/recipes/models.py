@@ -2,9 +2,12 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from colorfield.fields import ColorField
+
+from .search import normalize_name
 from backend.constants import (EMAIL_LENGTH, NAME_LENGTH, TAG_NAME_LENGHT,
                                INGREDIENT_NAME_LENGHT, MEASUREMENT_LENGHT,
-                               PECIPE_NAME, MIN_COOKING_TIME, MIN_AMOUNT)
+                               PECIPE_NAME, MIN_COOKING_TIME, MIN_AMOUNT,
+                               MIN_SERVINGS)
 
 
 class User(AbstractUser):
@@ -69,11 +72,33 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=MEASUREMENT_LENGHT, verbose_name='количество ингредиента'
     )
+    search_name = models.CharField(
+        max_length=INGREDIENT_NAME_LENGHT, editable=False,
+        verbose_name='Название для поиска'
+    )
+    # Пищевая ценность и цена на одну единицу измерения, если известны.
+    calories = models.FloatField(
+        null=True, blank=True, verbose_name='Калории, ккал')
+    proteins = models.FloatField(
+        null=True, blank=True, verbose_name='Белки, г')
+    fats = models.FloatField(
+        null=True, blank=True, verbose_name='Жиры, г')
+    carbohydrates = models.FloatField(
+        null=True, blank=True, verbose_name='Углеводы, г')
+    price = models.FloatField(
+        null=True, blank=True, verbose_name='Цена, руб.')
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(
+                fields=('search_name',),
+                name='ingredient_search_name_idx',
+                opclasses=('varchar_pattern_ops',),
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('name', 'measurement_unit'),
@@ -84,6 +109,10 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
     """Модель рецепта"""
@@ -109,15 +138,74 @@ class Recipe(models.Model):
         db_index=True,
         verbose_name='Дата публикации рецепта'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения рецепта'
+    )
+    revision = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия рецепта'
+    )
+    # В отличие от revision, меняется только правкой самого рецепта,
+    # а не пересчётом итогов или изменением автора и тегов.
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия правки'
+    )
+    # Суммы по ингредиентам, пересчитываются в recipes.nutrition;
+    # NULL, если у какого-то ингредиента нет данных.
+    calories = models.FloatField(
+        null=True, editable=False, db_index=True,
+        verbose_name='Калории, ккал')
+    proteins = models.FloatField(
+        null=True, editable=False, verbose_name='Белки, г')
+    fats = models.FloatField(
+        null=True, editable=False, verbose_name='Жиры, г')
+    carbohydrates = models.FloatField(
+        null=True, editable=False, verbose_name='Углеводы, г')
+    cost = models.FloatField(
+        null=True, editable=False, verbose_name='Стоимость, руб.')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('author', '-created'),
+                name='recipe_author_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Любое сохранение повышает версию рецепта, по которой
+        кешируется ответ API (в том числе правки из админки),
+        и дату изменения для Last-Modified, даже при update_fields.
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        # В базе версия повышается атомарно, а в памяти — без
+        # повторного SELECT: параллельный bump_revision может сделать
+        # её в базе больше, что для ETag лишь даст лишний 200.
+        revision = self.revision
+        self.revision = models.F('revision') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'revision', 'updated'}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.revision = revision
+            raise
+        self.revision = revision + 1
+
 
 class IngredientQuantity(models.Model):
     """Количество ингридиентов рецептах"""
@@ -136,6 +224,14 @@ class IngredientQuantity(models.Model):
     class Meta:
         verbose_name = 'Количество ингредиента'
         verbose_name_plural = 'Количество ингредиентов'
+        indexes = [
+            # Список покупок и страницы рецептов читаются только по индексу.
+            models.Index(
+                fields=('recipe',),
+                include=('ingredient', 'amount'),
+                name='ingredientquantity_recipe_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('recipe', 'ingredient'),
@@ -204,6 +300,13 @@ class FavoriteRecipe(AbstractRelation):
 
 class ShoppingCart(AbstractRelation):
     """Модель для списка покупок"""
+    servings = models.PositiveSmallIntegerField(
+        default=MIN_SERVINGS,
+        verbose_name='Порций',
+        validators=[
+            MinValueValidator(MIN_SERVINGS, message='Минимум одна порция!'),
+        ]
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -238,3 +341,72 @@ class TagInRecipe(models.Model):
 
     def __str__(self):
         return f'{self.tag} {self.recipe}'
+
+
+class MealPlanEntry(models.Model):
+    """Рецепт в плане питания на дату"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='meal_plan',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='meal_plan_entries',
+        verbose_name='Рецепт'
+    )
+    date = models.DateField(verbose_name='Дата')
+    servings = models.PositiveSmallIntegerField(
+        default=MIN_SERVINGS,
+        verbose_name='Порций',
+        validators=[
+            MinValueValidator(MIN_SERVINGS, message='Минимум одна порция!'),
+        ]
+    )
+
+    class Meta:
+        verbose_name = 'Запись плана питания'
+        verbose_name_plural = 'План питания'
+        ordering = ('date', 'id')
+        indexes = [
+            models.Index(
+                fields=('user', 'date'),
+                name='mealplanentry_user_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.date} {self.recipe}'
+
+
+class WeeklyMealPlan(models.Model):
+    """Итоги плана питания за неделю, пересчитываются при изменениях"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='weekly_meal_plans',
+        verbose_name='Пользователь'
+    )
+    week = models.DateField(verbose_name='Понедельник недели')
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name='Рецептов')
+    cooking_time = models.PositiveIntegerField(
+        default=0, verbose_name='Время приготовления')
+    ingredients = models.JSONField(default=list, verbose_name='Ингредиенты')
+    tags = models.JSONField(default=dict, verbose_name='Теги')
+    updated = models.DateTimeField(auto_now=True, verbose_name='Пересчитан')
+
+    class Meta:
+        verbose_name = 'Итоги недели'
+        verbose_name_plural = 'Итоги недель'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'week'),
+                name='unique_user_week'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.week}'
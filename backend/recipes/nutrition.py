@@ -0,0 +1,100 @@
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import IngredientQuantity, Recipe, ShoppingCart
+
+# Поле ингредиента (на единицу измерения) -> итоговое поле рецепта.
+NUTRIENTS = {
+    'calories': 'calories',
+    'proteins': 'proteins',
+    'fats': 'fats',
+    'carbohydrates': 'carbohydrates',
+    'price': 'cost',
+}
+TOTALS = tuple(NUTRIENTS.values())
+
+
+def recipe_totals(recipe_ids):
+    """
+    Калорийность, БЖУ и стоимость рецептов. Все строки состава
+    читаются одним запросом и суммируются по рецептам через
+    np.bincount. Если хотя бы у одного ингредиента нет данных,
+    итог неизвестен (None), а не занижен.
+    """
+    # numpy импортируется здесь, а не при загрузке модуля: модуль
+    # тянут сериализаторы, и иначе numpy грузил бы каждый воркер.
+    import numpy as np
+
+    recipe_ids = list(recipe_ids)
+    totals = {
+        recipe_id: dict.fromkeys(TOTALS) for recipe_id in recipe_ids}
+    rows = list(IngredientQuantity.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'amount',
+        *(f'ingredient__{field}' for field in NUTRIENTS)
+    ))
+    if not rows:
+        return totals
+    matrix = np.array(rows, dtype=float)
+    ids, index = np.unique(matrix[:, 0], return_inverse=True)
+    missing = np.isnan(matrix[:, 2:])
+    values = np.where(missing, 0, matrix[:, 2:]) * matrix[:, 1:2]
+    sums = np.stack([
+        np.bincount(index, weights=values[:, column], minlength=len(ids))
+        for column in range(len(TOTALS))
+    ], axis=1).round(2)
+    gaps = np.stack([
+        np.bincount(index, weights=missing[:, column], minlength=len(ids))
+        for column in range(len(TOTALS))
+    ], axis=1)
+    sums = np.where(gaps > 0, np.nan, sums)
+    for recipe_id, row in zip(ids.astype(int).tolist(), sums.tolist()):
+        totals[recipe_id] = {
+            field: None if np.isnan(value) else value
+            for field, value in zip(TOTALS, row)
+        }
+    return totals
+
+
+def set_totals(recipe):
+    """Проставляет рецепту итоги без сохранения."""
+    for field, value in recipe_totals([recipe.id])[recipe.id].items():
+        setattr(recipe, field, value)
+
+
+def refresh_recipes(recipe_ids, batch_size=1000):
+    """
+    Пересчитывает и сохраняет итоги рецептов пачками, повышая
+    их версию, чтобы сбросить кеш и ETag.
+    """
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), batch_size):
+        totals = recipe_totals(recipe_ids[start:start + batch_size])
+        now = timezone.now()
+        Recipe.objects.bulk_update([
+            Recipe(
+                id=recipe_id, revision=F('revision') + 1, updated=now,
+                **values)
+            for recipe_id, values in totals.items()
+        ], (*TOTALS, 'revision', 'updated'))
+
+
+def cart_totals(user):
+    """
+    Итоги корзины с учётом числа порций, одним агрегатом.
+    Итог неизвестен (None), если он неизвестен хотя бы у одного рецепта.
+    """
+    totals = ShoppingCart.objects.filter(user=user).aggregate(**{
+        field: Sum(F('servings') * F(f'recipe__{field}'))
+        for field in TOTALS
+    }, **{
+        f'{field}_missing': Count(
+            'id', filter=Q(**{f'recipe__{field}__isnull': True}))
+        for field in TOTALS
+    })
+    return {
+        field: None if totals[f'{field}_missing'] else round(
+            totals[field] or 0, 2)
+        for field in TOTALS
+    }
@@ -0,0 +1,23 @@
+# Латинская раскладка клавиатуры -> кириллическая (ЙЦУКЕН).
+KEYBOARD_LAYOUT = str.maketrans(
+    "qwertyuiop[]asdfghjkl;'zxcvbnm,.`",
+    'йцукенгшщзхъфывапролджэячсмитьбюё',
+)
+
+
+def normalize_name(value):
+    """Нормализованное название для поиска: нижний регистр, ё -> е."""
+    return ' '.join(value.lower().replace('ё', 'е').split())
+
+
+def search_variants(query):
+    """
+    Варианты поискового запроса: как введён и, если запрос
+    набран в латинской раскладке, — переведённый в кириллицу.
+    """
+    normalized = normalize_name(query)
+    variants = [normalized]
+    translated = normalize_name(normalized.translate(KEYBOARD_LAYOUT))
+    if translated != normalized:
+        variants.append(translated)
+    return variants
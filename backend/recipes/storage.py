@@ -0,0 +1,35 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Хранилище, называющее файлы по sha256 содержимого.
+    Повторная загрузка той же картинки не пишет на диск, а имя
+    не меняется, поэтому файлы можно кэшировать как неизменяемые.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest.hexdigest() + extension)
+        try:
+            # Свежий mtime защищает файл от delete_files и gc_media,
+            # которые не трогают недавно изменённые файлы.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            # Файла нет (или его только что удалили) — пишем заново.
+            return super().save(name, content, max_length)
@@ -0,0 +1,13 @@
+from django.contrib.admin import ModelAdmin, register
+
+from .models import Task
+
+
+@register(Task)
+class TaskAdmin(ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'run_after', 'updated',
+    )
+    list_filter = ('status',)
+    search_fields = ('^idempotency_key',)
+    readonly_fields = ('created', 'updated')
@@ -0,0 +1,231 @@
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Task
+
+
+@dataclass
+class TaskMessage:
+    """Задача, выданная исполнителю."""
+    id: str
+    name: str
+    payload: dict = field(default_factory=dict)
+    attempts: int = 1
+    max_attempts: int = 3
+
+
+class DatabaseBackend:
+    """
+    Очередь в таблице Task. Исполнители забирают задачи через
+    SELECT ... FOR UPDATE SKIP LOCKED; задачи зависших исполнителей
+    возвращаются в работу по истечении visibility_timeout.
+    """
+
+    def __init__(self, visibility_timeout=300):
+        self.visibility_timeout = visibility_timeout
+
+    def enqueue(self, name, payload, idempotency_key=None, delay=0,
+                max_attempts=3):
+        run_after = timezone.now() + timedelta(seconds=delay)
+        if idempotency_key is not None:
+            existing = Task.objects.filter(
+                idempotency_key=idempotency_key).first()
+            if existing is not None:
+                return str(existing.id)
+        try:
+            with transaction.atomic():
+                task = Task.objects.create(
+                    name=name, payload=payload, run_after=run_after,
+                    idempotency_key=idempotency_key,
+                    max_attempts=max_attempts,
+                )
+        except IntegrityError:
+            task = Task.objects.get(idempotency_key=idempotency_key)
+        return str(task.id)
+
+    def reserve(self, limit):
+        now = timezone.now()
+        expired = now - timedelta(seconds=self.visibility_timeout)
+        with transaction.atomic():
+            # Задача, исчерпавшая попытки и снова не завершённая
+            # (например, её исполнитель упал по памяти), больше
+            # не выдаётся, как и в RedisBackend.recover.
+            Task.objects.filter(
+                status=Task.RUNNING, updated__lt=expired,
+                attempts__gte=F('max_attempts'),
+            ).update(
+                status=Task.FAILED, last_error='visibility timeout expired',
+                updated=now)
+            tasks = list(Task.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                Q(status=Task.PENDING, run_after__lte=now)
+                | Q(status=Task.RUNNING, updated__lt=expired,
+                    attempts__lt=F('max_attempts'))
+            ).order_by('run_after')[:limit])
+            Task.objects.filter(id__in=[task.id for task in tasks]).update(
+                status=Task.RUNNING, attempts=F('attempts') + 1, updated=now)
+        return [
+            TaskMessage(
+                id=str(task.id), name=task.name, payload=task.payload,
+                attempts=task.attempts + 1, max_attempts=task.max_attempts,
+            )
+            for task in tasks
+        ]
+
+    def complete(self, message):
+        Task.objects.filter(id=message.id).update(
+            status=Task.DONE, last_error='', updated=timezone.now())
+
+    def retry(self, message, error, delay):
+        Task.objects.filter(id=message.id).update(
+            status=Task.PENDING, last_error=error, updated=timezone.now(),
+            run_after=timezone.now() + timedelta(seconds=delay))
+
+    def fail(self, message, error):
+        Task.objects.filter(id=message.id).update(
+            status=Task.FAILED, last_error=error, updated=timezone.now())
+
+    def prune(self, retention):
+        deleted, _ = Task.objects.filter(
+            status__in=(Task.DONE, Task.FAILED),
+            updated__lt=timezone.now() - timedelta(seconds=retention),
+        ).delete()
+        return deleted
+
+    def stats(self):
+        return dict(Task.objects.order_by().values_list(
+            'status').annotate(Count('id')))
+
+
+class RedisBackend:
+    """
+    Очередь в Redis для продакшена: готовые задачи в списке,
+    отложенные — в sorted set по времени запуска, выданные —
+    в sorted set по сроку аренды. Задачи зависших исполнителей
+    возвращаются в работу по истечении visibility_timeout.
+    Требует пакет redis.
+    """
+
+    # Переносит задачу из ready в reserved одной атомарной операцией,
+    # чтобы падение исполнителя между шагами не потеряло её.
+    RESERVE_SCRIPT = """
+        local data = redis.call('RPOP', KEYS[1])
+        if data then
+            redis.call('ZADD', KEYS[2], ARGV[1], data)
+        end
+        return data
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='tasks',
+                 idempotency_ttl=60 * 60 * 24, visibility_timeout=300,
+                 failed_limit=10000):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.idempotency_ttl = idempotency_ttl
+        self.visibility_timeout = visibility_timeout
+        self.failed_limit = failed_limit
+        self.reserve_script = self.redis.register_script(self.RESERVE_SCRIPT)
+
+    def key(self, name):
+        return f'{self.prefix}:{name}'
+
+    def enqueue(self, name, payload, idempotency_key=None, delay=0,
+                max_attempts=3):
+        task_id = uuid.uuid4().hex
+        if idempotency_key is not None and not self.redis.set(
+            self.key(f'idempotency:{idempotency_key}'), task_id,
+            nx=True, ex=self.idempotency_ttl
+        ):
+            return self.redis.get(
+                self.key(f'idempotency:{idempotency_key}')).decode()
+        self.push(TaskMessage(
+            id=task_id, name=name, payload=payload, attempts=0,
+            max_attempts=max_attempts,
+        ), delay)
+        return task_id
+
+    def push(self, message, delay=0):
+        data = json.dumps(message.__dict__)
+        if delay:
+            self.redis.zadd(self.key('delayed'), {data: time.time() + delay})
+        else:
+            self.redis.lpush(self.key('ready'), data)
+
+    def reserve(self, limit):
+        now = time.time()
+        for data in self.redis.zrangebyscore(self.key('delayed'), 0, now):
+            if self.redis.zrem(self.key('delayed'), data):
+                self.redis.lpush(self.key('ready'), data)
+        self.recover(now)
+        messages = []
+        for _ in range(limit):
+            data = self.reserve_script(
+                keys=[self.key('ready'), self.key('reserved')],
+                args=[now + self.visibility_timeout],
+            )
+            if data is None:
+                break
+            message = TaskMessage(**json.loads(data))
+            message.attempts += 1
+            message.raw = data
+            messages.append(message)
+        return messages
+
+    def recover(self, now):
+        """Возвращает в очередь задачи с истёкшей арендой."""
+        for data in self.redis.zrangebyscore(self.key('reserved'), 0, now):
+            if not self.redis.zrem(self.key('reserved'), data):
+                continue
+            message = TaskMessage(**json.loads(data))
+            message.attempts += 1
+            if message.attempts < message.max_attempts:
+                self.push(message)
+            else:
+                self.push_failed(message, 'visibility timeout expired')
+
+    def complete(self, message):
+        self.redis.zrem(self.key('reserved'), message.raw)
+        self.redis.incr(self.key('done'))
+
+    def retry(self, message, error, delay):
+        self.redis.zrem(self.key('reserved'), message.raw)
+        del message.raw
+        self.push(message, delay)
+
+    def fail(self, message, error):
+        self.redis.zrem(self.key('reserved'), message.raw)
+        del message.raw
+        self.push_failed(message, error)
+
+    def push_failed(self, message, error):
+        self.redis.lpush(self.key('failed'), json.dumps(
+            {**message.__dict__, 'error': error}))
+
+    def prune(self, retention):
+        """
+        Ключи идемпотентности истекают сами, поэтому хранится
+        только хвост из failed_limit последних упавших задач.
+        """
+        pruned = max(self.redis.llen(self.key('failed')) - self.failed_limit,
+                     0)
+        self.redis.ltrim(self.key('failed'), 0, self.failed_limit - 1)
+        return pruned
+
+    def stats(self):
+        return {
+            Task.PENDING: (self.redis.llen(self.key('ready'))
+                           + self.redis.zcard(self.key('delayed'))),
+            Task.RUNNING: self.redis.zcard(self.key('reserved')),
+            Task.DONE: int(self.redis.get(self.key('done')) or 0),
+            Task.FAILED: self.redis.llen(self.key('failed')),
+        }
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.queue import prune, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Исполнитель фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument(
+            '--sleep', type=float, default=1,
+            help='пауза при пустой очереди, с')
+        parser.add_argument(
+            '--prune-every', type=float, default=60 * 60,
+            help='период удаления старых завершённых задач, с')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        pruned_at = None
+        while True:
+            if (pruned_at is None or time.monotonic() - pruned_at
+                    >= options['prune_every']):
+                prune()
+                pruned_at = time.monotonic()
+            done = run_pending(options['batch_size'])
+            if options['once'] and not done:
+                return
+            if not done:
+                time.sleep(options['sleep'])
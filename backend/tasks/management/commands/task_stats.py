@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import Task
+from tasks.queue import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Глубина очереди фоновых задач по статусам'
+
+    def handle(self, *args, **options):
+        stats = get_backend().stats()
+        for status, label in Task.STATUSES:
+            self.stdout.write(f'{label:<12} {stats.get(status, 0)}')
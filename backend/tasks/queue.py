@@ -0,0 +1,88 @@
+import logging
+import traceback
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    config = settings.TASKS
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def task(func):
+    """
+    Регистрирует функцию как фоновую задачу.
+    Аргументы задачи должны сериализоваться в JSON.
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    registry[name] = func
+
+    def delay(idempotency_key=None, countdown=0, **payload):
+        return enqueue(name, payload, idempotency_key, countdown)
+
+    func.task_name = name
+    func.delay = delay
+    return func
+
+
+def enqueue(name, payload, idempotency_key=None, countdown=0):
+    """
+    Ставит задачу в очередь после фиксации текущей транзакции, чтобы
+    исполнитель не увидел задачу раньше данных (и не получил задачу
+    из откаченной транзакции); при TASKS['EAGER'] выполняет её сразу.
+    """
+    def send():
+        if settings.TASKS.get('EAGER'):
+            registry[name](**payload)
+            return
+        get_backend().enqueue(
+            name, payload, idempotency_key=idempotency_key, delay=countdown,
+            max_attempts=settings.TASKS.get('MAX_ATTEMPTS', 3),
+        )
+
+    transaction.on_commit(send)
+
+
+def run_pending(limit=10):
+    """Выполняет до limit готовых задач, возвращает их число."""
+    backend = get_backend()
+    messages = backend.reserve(limit)
+    for message in messages:
+        try:
+            registry[message.name](**message.payload)
+        except Exception:
+            error = traceback.format_exc()
+            if message.attempts < message.max_attempts:
+                delay = settings.TASKS.get('RETRY_DELAY', 10) * (
+                    2 ** (message.attempts - 1))
+                backend.retry(message, error, delay)
+                logger.warning(
+                    'Задача %s #%s упала, повтор через %s с',
+                    message.name, message.id, delay)
+            else:
+                backend.fail(message, error)
+                logger.error(
+                    'Задача %s #%s упала окончательно',
+                    message.name, message.id)
+        else:
+            backend.complete(message)
+    return len(messages)
+
+
+def prune(retention=None):
+    """
+    Удаляет завершённые и упавшие задачи старше retention секунд
+    (по умолчанию TASKS['RETENTION']), вместе с ними истекают
+    и ключи идемпотентности.
+    """
+    if retention is None:
+        retention = settings.TASKS.get('RETENTION', 60 * 60 * 24)
+    return get_backend().prune(retention)